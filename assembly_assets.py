@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+
+import numpy as np
+
+from audio_timeline import sample_dtype
+from audio_normalize import normalize, read_audio
+from synthesis_cache import file_content_hash
+
+
+# Bump when rendering changes so stale cached assets are not reused.
+ASSET_VERSION = 2
+
+
+def _readonly(array):
+    array.flags.writeable = False
+    return array
+
+
+def _midpoint(dtype):
+    return 128.0 if dtype == np.uint8 else 0.0
+
+
+def to_dtype(x, dtype):
+    """Round and clip float samples (already in `dtype`'s scale) into `dtype`."""
+    info = np.iinfo(dtype)
+    return np.clip(np.rint(x), info.min, info.max).astype(dtype)
+
+
+@lru_cache(maxsize=32)
+def silence(ms, frame_rate, channels, sample_width):
+    """Read-only block of `ms` milliseconds of digital silence in the target format."""
+    dtype = sample_dtype(sample_width)
+    frames = int(frame_rate * ms / 1000.0)
+    return _readonly(np.full((frames, channels), _midpoint(dtype), dtype=dtype))
+
+
+@lru_cache(maxsize=32)
+def fade_ramp(frames):
+    """Linear 0 -> 1 gain ramp shaped (frames, 1), shared by every segment with this fade length."""
+    return _readonly(np.linspace(0.0, 1.0, int(frames), dtype=np.float32)[:, None])
+
+
+def apply_fades(samples, fade_in_frames=0, fade_out_frames=0):
+    """Fade (frames, channels) integer PCM in place with precomputed ramps; returns `samples`."""
+    mid = _midpoint(samples.dtype)
+    for frames, head in ((fade_in_frames, True), (fade_out_frames, False)):
+        frames = min(int(frames), len(samples))
+        if frames <= 0:
+            continue
+        ramp = fade_ramp(frames)
+        part = samples[:frames] if head else samples[len(samples) - frames:]
+        gain = ramp if head else ramp[::-1]
+        part[...] = to_dtype((part - mid) * gain + mid, samples.dtype)
+    return samples
+
+
+def edge_fade(samples, frame_rate, edge_fade_ms):
+    """maybe_edge_fade for arrays: fade both ends unless the segment is too short."""
+    frames = int(frame_rate * edge_fade_ms / 1000.0)
+    if frames <= 0 or len(samples) <= frames * 2:
+        return samples
+    return apply_fades(samples, frames, frames)
+
+
+class AssetCache:
+    """
+    Assembly assets pre-rendered in the target format and stored as .npy files in
+    `cache_dir`, keyed by source file content and every rendering parameter, so later
+    runs skip decoding (ffmpeg for mp3), gain and fades.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, kind, params):
+        blob = json.dumps(dict(params, version=ASSET_VERSION), sort_keys=True).encode("utf-8")
+        return os.path.join(self.cache_dir, "{}_{}.npy".format(kind, hashlib.sha256(blob).hexdigest()[:24]))
+
+    def ding(self, path, frame_rate, channels, sample_width, gain_db=0.0, fade_in_ms=0, fade_out_ms=0):
+        params = {
+            "source": file_content_hash(os.path.abspath(path)),
+            "frame_rate": int(frame_rate),
+            "channels": int(channels),
+            "sample_width": int(sample_width),
+            "gain_db": float(gain_db or 0.0),
+            "fade_in_ms": int(fade_in_ms),
+            "fade_out_ms": int(fade_out_ms),
+        }
+        cached = self._path("ding", params)
+        if os.path.exists(cached):
+            try:
+                return _readonly(np.load(cached))
+            except (OSError, ValueError):
+                pass
+
+        samples = self._render_ding(path, params)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = cached + ".tmp.npy"
+            np.save(tmp_path, samples)
+            os.replace(tmp_path, cached)
+        except OSError as e:
+            print("Warning: could not cache rendered ding:", e)
+        return _readonly(samples)
+
+    @staticmethod
+    def _render_ding(path, params):
+        sample_rate, samples = read_audio(path)
+        samples = np.array(normalize(
+            samples, sample_rate, params["frame_rate"], params["channels"], params["sample_width"]
+        ))
+        dtype = samples.dtype
+
+        if params["gain_db"]:
+            mid = _midpoint(dtype)
+            samples = to_dtype((samples - mid) * 10.0 ** (params["gain_db"] / 20.0) + mid, dtype)
+        rate = params["frame_rate"] / 1000.0
+        return apply_fades(samples, params["fade_in_ms"] * rate, params["fade_out_ms"] * rate)
@@ -0,0 +1,150 @@
+import wave
+from math import gcd
+from functools import lru_cache
+
+import numpy as np
+
+from audio_timeline import sample_dtype
+
+
+# Windowed-sinc design for the polyphase resampler: zero crossings on each side of the
+# kernel centre, Kaiser beta (~90 dB stopband) and cutoff as a fraction of the lower Nyquist.
+ZERO_CROSSINGS = 16
+KAISER_BETA = 8.6
+ROLLOFF = 0.945
+
+_MIDPOINTS = {np.dtype(np.uint8): 128.0}
+
+
+def _full_scale(dtype):
+    return float(-np.iinfo(dtype).min) if dtype.kind == "i" else 128.0
+
+
+def to_float(samples):
+    """Integer PCM shaped (n, channels) as float32 in [-1, 1)."""
+    samples = np.asarray(samples)
+    x = samples.astype(np.float32)
+    mid = _MIDPOINTS.get(samples.dtype)
+    if mid:
+        x -= mid
+    x *= 1.0 / _full_scale(samples.dtype)
+    return x
+
+
+def from_float(x, dtype):
+    """float samples in [-1, 1) as integer PCM of `dtype`; scales, rounds and clips `x` in place."""
+    dtype = np.dtype(dtype)
+    info = np.iinfo(dtype)
+    x *= _full_scale(dtype)
+    mid = _MIDPOINTS.get(dtype)
+    if mid:
+        x += mid
+    np.rint(x, out=x)
+    high = x.dtype.type(info.max)
+    if int(high) > info.max:
+        # float32 rounds int32's max up to 2**31, which the cast would wrap to the minimum.
+        high = np.nextafter(high, x.dtype.type(0))
+    np.clip(x, info.min, high, out=x)
+    return x.astype(dtype)
+
+
+def mix_channels(x, channels):
+    """Average down to mono or duplicate mono up, like pydub set_channels."""
+    have = x.shape[1]
+    if have == channels:
+        return x
+    if have > 1:
+        x = x.mean(axis=1, keepdims=True, dtype=np.float32)
+    if channels > 1:
+        x = np.repeat(x, channels, axis=1)
+    return x
+
+
+@lru_cache(maxsize=16)
+def polyphase_kernel(src_rate, dst_rate):
+    """
+    (up, down, phases) for resampling src_rate -> dst_rate. phases[p] holds taps p, p + up,
+    p + 2*up, ... of the anti-aliasing low-pass in reverse, ready to dot with an input window.
+    """
+    g = gcd(int(src_rate), int(dst_rate))
+    up, down = int(dst_rate) // g, int(src_rate) // g
+    half = ZERO_CROSSINGS * max(up, down)
+    taps = np.arange(-half, half + 1, dtype=np.float64)
+    cutoff = ROLLOFF * 0.5 / max(up, down)
+    h = 2.0 * cutoff * np.sinc(2.0 * cutoff * taps) * np.kaiser(len(taps), KAISER_BETA)
+    h *= up / h.sum()
+
+    per_phase = -(-len(h) // up)
+    padded = np.zeros(per_phase * up)
+    padded[:len(h)] = h
+    phases = np.ascontiguousarray(padded.reshape(per_phase, up).T[:, ::-1], dtype=np.float32)
+    phases.flags.writeable = False
+    return up, down, phases
+
+
+def resample(x, src_rate, dst_rate):
+    """Polyphase resampling of float32 (n, channels) audio; returns ceil(n * dst / src) frames."""
+    if src_rate == dst_rate or not len(x):
+        return x
+    up, down, phases = polyphase_kernel(src_rate, dst_rate)
+    per_phase = phases.shape[1]
+    centre = ZERO_CROSSINGS * max(up, down)
+    n_out = -(-len(x) * up // down)
+
+    # Zero padding covers taps that reach before the first or past the last input frame.
+    pad = per_phase + centre // up + 1
+    xp = np.zeros((len(x) + 2 * pad, x.shape[1]), dtype=np.float32)
+    xp[pad:pad + len(x)] = x
+    windows = np.lib.stride_tricks.sliding_window_view(xp, per_phase, axis=0)
+
+    # Output n uses phase (n*down + centre) % up, so each phase serves every up-th output and
+    # its input windows advance by `down` frames: one strided matrix product per phase.
+    out = np.empty((n_out, x.shape[1]), dtype=np.float32)
+    inverse = pow(down, -1, up)
+    for p in range(min(up, n_out)):
+        first = (p - centre) * inverse % up
+        if first >= n_out:
+            continue
+        count = -(-(n_out - first) // up)
+        start = (first * down + centre) // up + pad - per_phase + 1
+        out[first::up] = windows[start:start + count * down:down] @ phases[p]
+    return out
+
+
+def normalize(samples, sample_rate, frame_rate, channels, sample_width):
+    """
+    PCM `samples` (n,) or (n, channels) at `sample_rate` converted to `frame_rate`,
+    `channels` and `sample_width`. Audio already in the target format is returned as is.
+    """
+    samples = np.asarray(samples)
+    if samples.ndim == 1:
+        samples = samples.reshape(-1, 1)
+    dtype = sample_dtype(sample_width)
+    if sample_rate == frame_rate and samples.shape[1] == channels and samples.dtype == dtype:
+        return samples
+
+    x = to_float(samples)
+    # Mix down before resampling and up after it, so the resampler sees the fewest channels.
+    if channels < x.shape[1]:
+        x = mix_channels(x, channels)
+    x = resample(x, sample_rate, frame_rate)
+    x = mix_channels(x, channels)
+    return from_float(x, dtype)
+
+
+def read_audio(path):
+    """(sample_rate, integer PCM shaped (n, channels)); PCM WAV is read directly, other formats via pydub/ffmpeg."""
+    try:
+        with wave.open(path, "rb") as wf:
+            params = wf.getparams()
+            data = wf.readframes(params.nframes)
+        dtype = sample_dtype(params.sampwidth)
+        return params.framerate, np.frombuffer(data, dtype=dtype).reshape(-1, params.nchannels)
+    except (wave.Error, EOFError, ValueError):
+        pass
+
+    from pydub import AudioSegment
+
+    seg = AudioSegment.from_file(path)
+    samples = np.frombuffer(seg.raw_data, dtype=sample_dtype(seg.sample_width))
+    return seg.frame_rate, samples.reshape(-1, seg.channels)
@@ -0,0 +1,77 @@
+from collections import namedtuple
+
+import numpy as np
+
+
+QualityReport = namedtuple(
+    "QualityReport",
+    ["ok", "reason", "duration_s", "peak", "clip_ratio", "diff_median", "diff_p999", "spike_ratio"],
+)
+
+MIN_DURATION_S = 0.12
+MIN_PEAK = 1e-4
+MAX_CLIP_RATIO = 0.02
+SPIKE_P999 = 0.45
+SPIKE_RATIO = 120.0
+
+
+def to_mono_float(samples):
+    """float32 mono view of int16/float samples shaped (n,) or (n, channels)."""
+    samples = np.asarray(samples)
+    if samples.dtype == np.int16:
+        x = samples.astype(np.float32)
+        x *= 1.0 / 32768.0
+    else:
+        x = samples.astype(np.float32, copy=False)
+    if x.ndim > 1:
+        x = x.mean(axis=1) if x.shape[1] > 1 else x[:, 0]
+    return x
+
+
+def _linear_quantiles(values, qs):
+    # Same result as np.percentile(..., method="linear"), but one O(n) partition instead of sorts.
+    n = len(values)
+    positions = [q * (n - 1) for q in qs]
+    kth = sorted({int(np.floor(p)) for p in positions} | {int(np.ceil(p)) for p in positions})
+    part = np.partition(values, kth)
+    out = []
+    for p in positions:
+        lo, hi = int(np.floor(p)), int(np.ceil(p))
+        out.append(float(part[lo] + (part[hi] - part[lo]) * (p - lo)))
+    return out
+
+
+def analyze_samples(samples, sample_rate):
+    """Glitch metrics for decoded audio, computed on the in-memory samples."""
+    x = to_mono_float(samples)
+    n = len(x)
+    duration_s = n / float(sample_rate) if sample_rate else 0.0
+
+    def report(reason, peak=0.0, clip_ratio=0.0, diff_median=0.0, diff_p999=0.0, spike_ratio=0.0):
+        return QualityReport(reason is None, reason, duration_s, peak, clip_ratio, diff_median, diff_p999, spike_ratio)
+
+    if n == 0 or not sample_rate:
+        return report("empty")
+    if n < int(MIN_DURATION_S * sample_rate):
+        return report("too_short")
+
+    mag = np.abs(x)
+    peak = float(mag.max())
+    if peak < MIN_PEAK:
+        return report("silent", peak)
+
+    clip_ratio = float(np.count_nonzero(mag >= 0.999)) / n
+    if clip_ratio > MAX_CLIP_RATIO:
+        return report("clipping", peak, clip_ratio)
+
+    d = np.diff(x)
+    np.abs(d, out=d)
+    if len(d) < 100:
+        return report(None, peak, clip_ratio)
+
+    diff_median, diff_p999 = _linear_quantiles(d, (0.5, 0.999))
+    spike_ratio = diff_p999 / (diff_median + 1e-9)
+    reason = None
+    if diff_p999 > SPIKE_P999 and spike_ratio > SPIKE_RATIO:
+        reason = "spikes"
+    return report(reason, peak, clip_ratio, diff_median, diff_p999, spike_ratio)
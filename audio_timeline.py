@@ -0,0 +1,87 @@
+import wave
+import numpy as np
+
+
+_SAMPLE_DTYPES = {1: np.uint8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+
+
+def sample_dtype(sample_width):
+    """NumPy dtype of WAV PCM samples `sample_width` bytes wide (8-bit WAV is unsigned)."""
+    try:
+        return np.dtype(_SAMPLE_DTYPES[int(sample_width)])
+    except KeyError:
+        raise ValueError("Unsupported sample width: {}".format(sample_width))
+
+
+def pcm_bytes(audio):
+    """Raw PCM view of a pydub AudioSegment, NumPy array or bytes-like object, without copying."""
+    raw = getattr(audio, "raw_data", None)
+    if raw is not None:
+        return memoryview(raw).cast("B")
+    if isinstance(audio, np.ndarray):
+        return memoryview(np.ascontiguousarray(audio)).cast("B")
+    return memoryview(audio).cast("B")
+
+
+class AudioTimeline:
+    """
+    Collects PCM segment references with their frame offsets and renders them once.
+
+    Appending is O(1) and never copies audio, unlike `AudioSegment +=`, which rebuilds
+    the whole accumulated track on every call. With a `sink` (e.g. StreamingWavWriter)
+    segments are written through immediately and only the offsets are kept.
+    """
+
+    def __init__(self, frame_rate, channels, sample_width, sink=None):
+        self.frame_rate = int(frame_rate)
+        self.channels = int(channels)
+        self.sample_width = int(sample_width)
+        self.frame_bytes = self.channels * self.sample_width
+        self.total_frames = 0
+        self.sink = sink
+        self._segments = []
+
+    def append(self, audio):
+        data = pcm_bytes(audio)
+        frames = len(data) // self.frame_bytes
+        start = self.total_frames
+        if frames:
+            data = data[:frames * self.frame_bytes]
+            if self.sink is not None:
+                self.sink.write_frames(data)
+            else:
+                self._segments.append((start, data))
+            self.total_frames += frames
+        return start
+
+    def flush(self):
+        if self.sink is not None:
+            self.sink.flush()
+
+    def frames_to_ms(self, frames):
+        return frames * 1000.0 / self.frame_rate
+
+    @property
+    def duration_ms(self):
+        return self.frames_to_ms(self.total_frames)
+
+    def render(self):
+        if self.sink is not None:
+            raise RuntimeError("Timeline audio was streamed to its sink and cannot be rendered")
+        buf = np.zeros(self.total_frames * self.frame_bytes, dtype=np.uint8)
+        if self.sample_width == 1:
+            buf.fill(128)
+        for start, data in self._segments:
+            offset = start * self.frame_bytes
+            buf[offset:offset + len(data)] = np.frombuffer(data, dtype=np.uint8)
+
+        dtype = _SAMPLE_DTYPES.get(self.sample_width)
+        return buf.view(dtype) if dtype is not None else buf
+
+    def export_wav(self, path):
+        buf = self.render()
+        with wave.open(path, "wb") as wf:
+            wf.setnchannels(self.channels)
+            wf.setsampwidth(self.sample_width)
+            wf.setframerate(self.frame_rate)
+            wf.writeframes(buf)
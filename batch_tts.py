@@ -1,48 +1,132 @@
 import os
 import sys
+import time
+import queue
 import argparse
-import pysbd
-from simple_tts import get_model, run_tts_with_model
+import threading
+import numpy as np
+import text_segmenter
+from simple_tts_v2 import get_model, run_tts_batch, run_tts_with_model, TTSJob
+from inference_profiles import add_profile_argument
+from stream_writers import StreamingWavWriter
 
-def split_long_text(text, target_len=50):
+def split_long_text(text, target_len=50, language=None):
     """
     智能切分长文本。
+    分句器按语言缓存（language 为 None 时自动识别中/英），按 target_len 均衡切块。
     """
-    seg_en = pysbd.Segmenter(language="en", clean=False)
-    sentences = seg_en.segment(text)
-    
-    chunks = []
-    current_chunk = ""
-    
-    for sent in sentences:
-        sent = sent.strip()
-        if not sent:
+    return text_segmenter.split_long_text(text, target_len=target_len, language=language)
+
+def stream_synthesis(tts, prompt_wav, texts, **run_kwargs):
+    """
+    按顺序产出每段的 (index, (sample_rate, samples) 或 None)。
+    后台线程在调用方处理第 N 段时已开始合成第 N+1 段。
+    """
+    ready = queue.Queue(maxsize=2)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for i, text in enumerate(texts):
+                if stop.is_set():
+                    break
+                try:
+                    result = run_tts_with_model(tts, prompt_wav, text, None, **run_kwargs)
+                except Exception as e:
+                    print("Inference failed:", e)
+                    result = None
+                ready.put((i, result))
+        finally:
+            ready.put(None)
+
+    worker = threading.Thread(target=produce, name="tts-producer", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is None:
+                break
+            yield item
+    finally:
+        stop.set()
+
+def write_crossfaded(chunks, writer_factory, crossfade_ms=30):
+    """
+    把 stream_synthesis 的输出拼成一个连续的 wav，段与段之间做线性交叉淡化。
+    每段写完立即 flush，返回 (writer, 首段音频写出的时间戳)。
+    """
+    writer = None
+    tail = None
+    first_audio_at = None
+    for i, result in chunks:
+        if result is None:
+            print("FAILED: segment {}".format(i + 1))
             continue
-            
-        if len(current_chunk) + len(sent) > target_len and current_chunk:
-            chunks.append(current_chunk.strip())
-            current_chunk = sent + " "
+        sample_rate, samples = result
+        samples = np.asarray(samples, dtype=np.float32).reshape(len(samples), -1)
+        if writer is None:
+            writer = writer_factory(sample_rate, samples.shape[1])
+        fade = min(int(sample_rate * crossfade_ms / 1000), len(samples) // 2)
+
+        if tail is not None and fade > 0:
+            n = min(fade, len(tail))
+            ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)[:, None]
+            samples[:n] = tail[-n:] * (1.0 - ramp) + samples[:n] * ramp
+            head = tail[:-n]
         else:
-            current_chunk += sent + " "
-            
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-        
-    return chunks
+            head = tail
+        if head is not None and len(head):
+            writer.write_frames(np.clip(head, -32768, 32767).astype("<i2").tobytes())
+
+        tail = samples[len(samples) - fade:] if fade > 0 else samples[:0]
+        body = samples[:len(samples) - fade]
+        writer.write_frames(np.clip(body, -32768, 32767).astype("<i2").tobytes())
+        writer.flush()
+        if first_audio_at is None:
+            first_audio_at = time.perf_counter()
+        print("Streamed segment {}".format(i + 1))
+
+    if writer is not None and tail is not None and len(tail):
+        writer.write_frames(np.clip(tail, -32768, 32767).astype("<i2").tobytes())
+    return writer, first_audio_at
 
 def main():
     parser = argparse.ArgumentParser(description="Efficient Batch TTS")
     parser.add_argument("--text", type=str, required=True)
     parser.add_argument("--prompt_wav", type=str, required=True)
     parser.add_argument("--model_dir", type=str, required=True)
+    add_profile_argument(parser)
     parser.add_argument("--output_prefix", type=str, default="batch_out")
     parser.add_argument("--target_len", type=int, default=150)
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="Segments per run_tts_batch call; with a single prompt this gives no throughput gain, "
+        "it only sets the window --length_buckets sorts",
+    )
+    parser.add_argument(
+        "--quality_check",
+        action="store_true",
+        help="Check each segment for glitches and runaway length, retrying up to 2 more inferences",
+    )
+    parser.add_argument(
+        "--length_buckets",
+        action="store_true",
+        help="Run each batch shortest first with per-length max_mel_tokens caps",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write one continuous <output_prefix>.wav while later segments are still synthesizing",
+    )
+    parser.add_argument("--crossfade_ms", type=int, default=30, help="Crossfade between streamed segments")
 
     args = parser.parse_args()
 
     print(">> Initializing system...")
     try:
-        tts_model = get_model(args.model_dir)
+        tts_model = get_model(args.model_dir, profile=args.profile)
     except Exception as e:
         print("CRITICAL: Failed to load model:", e)
         sys.exit(1)
@@ -52,28 +136,58 @@ def main():
     total = len(segments)
     print(">> Total segments:", total)
 
+    jobs = []
     for i, seg_text in enumerate(segments):
-        idx = i + 1
-        output_name = "{}_{:03d}.wav".format(args.output_prefix, idx)
-        print("\n--- [Segment {}/{}] ---".format(idx, total))
-        
+        output_name = "{}_{:03d}.wav".format(args.output_prefix, i + 1)
         # 预先处理特殊字符，避免 f-string 渲染出错
         safe_text = seg_text.replace('\u2019', "'").replace('\u201c', '"').replace('\u201d', '"')
-        
-        preview = safe_text[:60] + "..." if len(safe_text) > 60 else safe_text
-        print("Synthesizing:", preview)
-        
-        success_path = run_tts_with_model(
-            tts=tts_model,
-            prompt_wav=args.prompt_wav,
-            text=safe_text,
-            output_path=output_name
+        jobs.append(TTSJob(args.prompt_wav, safe_text, output_name))
+
+    # Off by default: a single sampled inference per segment, as batch_tts always did.
+    check_kwargs = {"quality_check": args.quality_check, "max_retries": 2 if args.quality_check else 0}
+
+    if args.stream:
+        output_path = args.output_prefix + ".wav"
+        started = time.perf_counter()
+        writer, first_audio_at = write_crossfaded(
+            stream_synthesis(
+                tts_model, args.prompt_wav, [job.text for job in jobs], stable_mode=False, **check_kwargs
+            ),
+            lambda sample_rate, channels: StreamingWavWriter(output_path, sample_rate, channels, 2),
+            crossfade_ms=args.crossfade_ms,
         )
-        
-        if success_path:
-            print("Saved:", output_name)
-        else:
-            print("FAILED:", output_name)
+        if writer is None:
+            print("FAILED: no audio generated")
+            return
+        writer.close()
+        print(">> Time to first audio: {:.2f}s".format(first_audio_at - started))
+        print(">> Total time: {:.2f}s".format(time.perf_counter() - started))
+        print("Saved:", output_path)
+        return
+
+    batch_size = max(1, args.batch_size)
+    for start in range(0, total, batch_size):
+        batch = jobs[start:start + batch_size]
+        for offset, job in enumerate(batch):
+            preview = job.text[:60] + "..." if len(job.text) > 60 else job.text
+            print("\n--- [Segment {}/{}] ---".format(start + offset + 1, total))
+            print("Synthesizing:", preview)
+
+        # Keep the sampled decoding batch_tts had with simple_tts.run_tts_with_model.
+        results = run_tts_batch(
+            tts_model,
+            batch,
+            batch_size=batch_size,
+            length_buckets=args.length_buckets,
+            stable_mode=False,
+            **check_kwargs,
+        )
+
+        for job, success_path in zip(batch, results):
+            if success_path:
+                print("Saved:", job.output_path)
+            else:
+                print("FAILED:", job.output_path)
 
 if __name__ == "__main__":
     main()
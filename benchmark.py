@@ -0,0 +1,373 @@
+import os
+import sys
+import csv
+import json
+import time
+import zlib
+import argparse
+import platform
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+
+import numpy as np
+
+import length_scheduler
+from wav_io import write_wav
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+FAKE_SAMPLE_RATE = 22050
+STAGE_SAMPLE = 200
+
+_EN_WORDS = (
+    "the a we you they time work study music river light morning window answer question "
+    "quickly never always often bring carry listen remember explain open close find build "
+    "small bright quiet early careful simple happy ready because while after before"
+).split()
+_ZH_CHARS = "我们你他她今天明天学习工作音乐河流光早上窗户回答问题总是经常带听记住解释打开关闭找到建造小亮安静早仔细简单快乐准备因为之后以前"
+
+
+class FakeIndexTTS2:
+    """
+    Deterministic stand-in for IndexTTS2.infer: a voiced harmonic signal whose length is the
+    length_scheduler estimate for the text and whose pitch depends on the prompt, so the
+    audio, retries and assembly behave like real output without checkpoints.
+    """
+
+    def __init__(self, model_dir=None, sample_rate=FAKE_SAMPLE_RATE):
+        self.model_dir = model_dir
+        self.sample_rate = sample_rate
+        self.calls = 0
+        self.audio_seconds = 0.0
+        self.infer_seconds = 0.0
+
+    def manual_seed(self, seed):
+        pass
+
+    def synthesize(self, prompt_wav, text):
+        seconds = length_scheduler.estimate_seconds(text)
+        n = int(seconds * self.sample_rate)
+        t = np.arange(n, dtype=np.float32) / self.sample_rate
+        f0 = 100.0 + zlib.crc32(os.path.basename(prompt_wav).encode("utf-8")) % 120
+        voiced = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 5))
+        envelope = 0.55 - 0.45 * np.cos(2 * np.pi * 4.0 * t)
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        x = 0.18 * voiced * envelope + 0.004 * rng.standard_normal(n)
+        return (x * 32767).astype(np.int16).reshape(-1, 1)
+
+    def infer(self, spk_audio_prompt, text, output_path, verbose=False, **kwargs):
+        started = time.perf_counter()
+        samples = self.synthesize(spk_audio_prompt, text)
+        self.calls += 1
+        self.audio_seconds += len(samples) / float(self.sample_rate)
+        if output_path is not None:
+            write_wav(output_path, self.sample_rate, samples)
+            result = output_path
+        else:
+            result = (self.sample_rate, samples)
+        self.infer_seconds += time.perf_counter() - started
+        return result
+
+
+def make_deck(path, rows, seed=0, repeat_ratio=0.1):
+    """CSV with english/chinese columns; about `repeat_ratio` of the rows repeat earlier ones."""
+    rng = np.random.default_rng(seed)
+    written = []
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["english", "chinese"])
+        writer.writeheader()
+        for _ in range(rows):
+            if written and rng.random() < repeat_ratio:
+                row = written[int(rng.integers(len(written)))]
+            else:
+                words = rng.choice(_EN_WORDS, size=int(rng.integers(4, 15)))
+                chars = rng.choice(list(_ZH_CHARS), size=int(rng.integers(5, 17)))
+                row = {
+                    "english": " ".join(words).capitalize() + ".",
+                    "chinese": "".join(chars) + "。",
+                }
+                written.append(row)
+            writer.writerow(row)
+
+
+def _make_ding(path):
+    sr = 44100
+    t = np.arange(int(sr * 0.6)) / sr
+    tone = 0.5 * np.sin(2 * np.pi * 880 * t) * np.exp(-5 * t)
+    write_wav(path, sr, (np.stack([tone, tone], axis=1) * 32767).astype(np.int16))
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def _stage(seconds, calls):
+    return {"seconds": round(seconds, 6), "calls": calls, "ms_per_call": round(seconds * 1000.0 / max(1, calls), 4)}
+
+
+def _bench_stages(deck_path, work_dir, fake):
+    """Isolated timings of the pipeline's building blocks on (a sample of) the deck."""
+    import csv_batch_tts_v2 as pipeline
+    from simple_tts_v2 import _has_obvious_glitch
+    from wav_io import read_wav
+
+    stages = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rows, seconds = _timed(pipeline.load_csv_rows_with_fallback, deck_path)
+    stages["csv_load"] = _stage(seconds, len(rows))
+
+    from corpus_ingest import open_deck
+
+    deck_dir = os.path.join(work_dir, "decks")
+    deck, seconds = _timed(open_deck, deck_path, deck_dir)
+    stages["deck_build"] = _stage(seconds, len(deck))
+    started = time.perf_counter()
+    window = list(open_deck(deck_path, deck_dir).rows(len(deck) // 2, len(deck) // 2 + STAGE_SAMPLE))
+    stages["deck_row_range"] = _stage(time.perf_counter() - started, len(window))
+
+    sample = rows[:STAGE_SAMPLE]
+    try:
+        from batch_tts import split_long_text
+
+        passage = " ".join(row["english"] for row in sample)
+        started = time.perf_counter()
+        for row in rows:
+            split_long_text(row["english"], target_len=150)
+        split_long_text(passage, target_len=150)
+        stages["split_long_text"] = _stage(time.perf_counter() - started, len(rows) + 1)
+    except ImportError as e:
+        stages["split_long_text"] = {"skipped": str(e)}
+
+    paths = []
+    for i, row in enumerate(sample):
+        path = os.path.join(work_dir, "stage_{}.wav".format(i))
+        fake.infer("en.wav", row["english"], path)
+        paths.append(path)
+
+    started = time.perf_counter()
+    for path in paths:
+        _has_obvious_glitch(path)
+    stages["glitch_check"] = _stage(time.perf_counter() - started, len(paths))
+
+    segments = [read_wav(path) for path in paths]
+    started = time.perf_counter()
+    for sample_rate, samples in segments:
+        pipeline.normalize_audio(samples, sample_rate, 16000, 2, 2)
+    stages["normalize_audio"] = _stage(time.perf_counter() - started, len(segments))
+
+    for path in paths:
+        os.remove(path)
+    return stages
+
+
+def run_deck(rows, batch_size=1, length_buckets=False, keep_files=False):
+    """Benchmark one deck size in the current process; returns a JSON-able dict."""
+    import csv_batch_tts_v2 as pipeline
+
+    work_dir = tempfile.mkdtemp(prefix="tts_bench_")
+    deck_path = os.path.join(work_dir, "deck.csv")
+    output_path = os.path.join(work_dir, "out.wav")
+    make_deck(deck_path, rows)
+    _make_ding(os.path.join(work_dir, "ding.wav"))
+    for name in ("en.wav", "zh.wav"):
+        prompt = FakeIndexTTS2()
+        write_wav(os.path.join(work_dir, name), prompt.sample_rate, prompt.synthesize(name, "Reference prompt audio."))
+
+    stages = _bench_stages(deck_path, work_dir, FakeIndexTTS2(work_dir))
+
+    fake = FakeIndexTTS2(work_dir)
+    argv = [
+        "--csv", deck_path,
+        "--en_prompt", os.path.join(work_dir, "en.wav"),
+        "--zh_prompt", os.path.join(work_dir, "zh.wav"),
+        "--model_dir", work_dir,
+        "--output", output_path,
+        "--temp_dir", os.path.join(work_dir, "temp"),
+        "--cache_dir", os.path.join(work_dir, "cache"),
+        "--ding", os.path.join(work_dir, "ding.wav"),
+        "--stream_output",
+        "--no_cache",
+        "--batch_size", str(batch_size),
+    ]
+    if length_buckets:
+        argv.append("--length_buckets")
+
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        trace = pipeline.main(argv, tts_model=fake)
+    wall = time.perf_counter() - started
+    if not os.path.exists(output_path) or not fake.calls:
+        raise RuntimeError("pipeline produced no audio for the {}-row deck".format(rows))
+
+    output_bytes = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    stages["pipeline"] = _stage(wall, rows)
+    stages["fake_infer"] = _stage(fake.infer_seconds, fake.calls)
+    assembly = max(wall - fake.infer_seconds, 1e-9)
+
+    result = {
+        "rows": rows,
+        "synthesis_calls": fake.calls,
+        "synthesized_audio_s": round(fake.audio_seconds, 3),
+        "output_audio_s": round(max(0, output_bytes - 44) / (2.0 * FAKE_SAMPLE_RATE), 3),
+        "wall_s": round(wall, 4),
+        "rows_per_s": round(rows / wall, 3) if wall else None,
+        "rows_per_s_excluding_model": round(rows / assembly, 3),
+        "peak_rss_mb": None,
+        "stages": stages,
+        "pipeline_stages": trace["stages"],
+        "counters": trace["counters"],
+    }
+    if resource is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS.
+        scale = 1.0 if sys.platform == "darwin" else 1024.0
+        result["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20, 1)
+
+    if keep_files:
+        result["work_dir"] = work_dir
+    else:
+        for root, dirs, files in os.walk(work_dir, topdown=False):
+            for name in files:
+                os.remove(os.path.join(root, name))
+            for name in dirs:
+                os.rmdir(os.path.join(root, name))
+        os.rmdir(work_dir)
+    return result
+
+
+def run_profile(model_dir, profile, prompt_wav, rows, seed=0):
+    """
+    Real IndexTTS2 under one inference profile: load time, first-sentence latency, throughput
+    and the glitch rate of first attempts (no retries) on `rows` sentences of a generated deck.
+    """
+    from audio_quality import analyze_samples
+    from retry_policy import RetryPolicy
+    from simple_tts_v2 import get_model, _build_infer_kwargs, _apply_seed
+
+    work_dir = tempfile.mkdtemp(prefix="tts_profile_")
+    deck_path = os.path.join(work_dir, "deck.csv")
+    make_deck(deck_path, max(1, (rows + 1) // 2), seed=seed, repeat_ratio=0.0)
+    with open(deck_path, encoding="utf-8-sig", newline="") as f:
+        texts = [text for row in csv.DictReader(f) for text in (row["english"], row["chinese"])][:rows]
+    os.remove(deck_path)
+    os.rmdir(work_dir)
+
+    started = time.perf_counter()
+    tts = get_model(model_dir, use_server=False, profile=profile)
+    load_s = time.perf_counter() - started
+
+    kwargs = _build_infer_kwargs(stable_mode=True)
+    latencies, audio_s, glitches, errors = [], 0.0, 0, 0
+    for i, text in enumerate(texts):
+        _apply_seed(tts, seed + i)
+        started = time.perf_counter()
+        try:
+            sample_rate, samples = tts.infer(
+                spk_audio_prompt=os.path.abspath(prompt_wav), text=text, output_path=None, verbose=False, **kwargs
+            )
+        except Exception as e:
+            errors += 1
+            print("   {}: inference failed: {}".format(profile, e), file=sys.stderr)
+            continue
+        latencies.append(time.perf_counter() - started)
+        audio_s += len(samples) / float(sample_rate)
+        runaway = RetryPolicy(text, kwargs).check_length(len(samples), sample_rate)
+        if runaway or not analyze_samples(samples, sample_rate).ok:
+            glitches += 1
+
+    wall = sum(latencies)
+    done = len(latencies)
+    return {
+        "profile": profile,
+        "sentences": len(texts),
+        "load_s": round(load_s, 3),
+        "first_sentence_s": round(latencies[0], 3) if latencies else None,
+        "sentences_per_s": round(done / wall, 3) if wall else None,
+        "rtf": round(audio_s / wall, 3) if wall else None,
+        "glitch_rate": round(glitches / float(done), 4) if done else None,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CSV synthesis/assembly pipeline with a fake IndexTTS2")
+    parser.add_argument("--decks", type=str, default="10,1000,10000", help="Comma separated deck sizes (rows)")
+    parser.add_argument("--batch_size", type=int, default=1)
+    parser.add_argument("--length_buckets", action="store_true")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this file")
+    parser.add_argument("--keep_files", action="store_true", help="Keep each deck's work directory")
+    parser.add_argument(
+        "--model_dir",
+        type=str,
+        default=None,
+        help="Also compare --profiles on the real model (speed versus glitch rate)",
+    )
+    parser.add_argument("--prompt_wav", type=str, default=None, help="Speaker prompt for the profile comparison")
+    parser.add_argument("--profiles", type=str, default="default,cpu-fast", help="Comma separated inference profiles")
+    parser.add_argument("--profile_rows", type=int, default=20, help="Sentences synthesized per profile")
+    args = parser.parse_args()
+    if args.model_dir and not args.prompt_wav:
+        parser.error("--model_dir needs --prompt_wav")
+
+    sizes = [int(size) for size in args.decks.split(",") if size.strip()]
+    report = {
+        "benchmark": "csv_batch_tts_v2",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "batch_size": args.batch_size,
+        "length_buckets": args.length_buckets,
+        "decks": [],
+    }
+
+    for rows in sizes:
+        print(">> Deck of {} rows...".format(rows), file=sys.stderr)
+        # A fresh process per deck so peak RSS belongs to that deck alone.
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+            deck = executor.submit(run_deck, rows, args.batch_size, args.length_buckets, args.keep_files).result()
+        report["decks"].append(deck)
+        print(
+            "   {:.1f} rows/s ({:.1f} excluding model), peak RSS {} MB".format(
+                deck["rows_per_s"], deck["rows_per_s_excluding_model"], deck["peak_rss_mb"]
+            ),
+            file=sys.stderr,
+        )
+
+    if args.model_dir:
+        report["profiles"] = []
+        for profile in [name.strip() for name in args.profiles.split(",") if name.strip()]:
+            print(">> Profile {} on {} sentences...".format(profile, args.profile_rows), file=sys.stderr)
+            # Fresh process per profile: quantization and thread settings are process-wide.
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as executor:
+                result = executor.submit(
+                    run_profile, args.model_dir, profile, args.prompt_wav, args.profile_rows
+                ).result()
+            baseline = report["profiles"][0] if report["profiles"] else result
+            if result["sentences_per_s"] and baseline["sentences_per_s"]:
+                result["speedup"] = round(result["sentences_per_s"] / baseline["sentences_per_s"], 3)
+            report["profiles"].append(result)
+            print(
+                "   {} sentences/s, RTF {}, glitch rate {}, load {}s".format(
+                    result["sentences_per_s"], result["rtf"], result["glitch_rate"], result["load_s"]
+                ),
+                file=sys.stderr,
+            )
+
+    text = json.dumps(report, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,32 @@
 import csv
+import argparse
 
-# 读取对话文本文件
-with open('dialogs.txt', 'r', encoding='utf-8') as file:
-    lines = file.readlines()
+from corpus_ingest import iter_text_pairs, write_deck
+
+parser = argparse.ArgumentParser(description="dialogs.txt -> dialogs.csv")
+parser.add_argument("--input", type=str, default="dialogs.txt", help="每行 \"英文 中文\" 的对话文本")
+parser.add_argument("--output", type=str, default="dialogs.csv")
+parser.add_argument("--deck", type=str, default=None, help="同时写出预处理 deck (JSONL + 行索引), 可直接传给 csv_batch_tts_v2.py --csv")
+args = parser.parse_args()
 
-# 准备 CSV 文件
-with open('dialogs.csv', 'w', newline='', encoding='utf-8') as csvfile:
-    csvwriter = csv.writer(csvfile)
 
+def pairs_to_csv(pairs, csvfile):
+    csvwriter = csv.writer(csvfile)
     # 写入 CSV 文件的标题行
     csvwriter.writerow(['english', 'chinese'])
-
-    for line in lines:
-        if line.strip():  # 跳过空行
-            parts = line.strip().rsplit(' ', 1)  # 从右边按最后一个空格进行分割
-            if len(parts) == 2:
-                english, chinese = parts
-                csvwriter.writerow([english.strip(), chinese.strip()])
-
-print("CSV 文件已生成: .csv")
-
-
-
+    for pair in pairs:
+        csvwriter.writerow(pair)
+        yield pair
+
+
+# 逐行读取对话文本 (编码自动检测), 按文字种类切分英文和中文, 边读边写
+with open(args.output, 'w', newline='', encoding='utf-8') as csvfile:
+    pairs = pairs_to_csv(iter_text_pairs(args.input), csvfile)
+    if args.deck:
+        count = write_deck(pairs, args.deck, {"source": args.input})
+    else:
+        count = sum(1 for _ in pairs)
+
+print("CSV 文件已生成: {} ({} 行)".format(args.output, count))
+if args.deck:
+    print("Deck 已生成: {}".format(args.deck))
@@ -0,0 +1,170 @@
+import os
+import csv
+import json
+import codecs
+import hashlib
+
+import numpy as np
+
+from length_scheduler import _CJK_RE
+
+
+SAMPLE_BYTES = 1 << 20
+FALLBACK_ENCODING = "gb18030"  # superset of gbk
+DECK_VERSION = 1
+DECK_FIELDS = ("english", "chinese")
+
+
+def detect_encoding(path, sample_bytes=SAMPLE_BYTES):
+    """Encoding of a text file from a byte sample: utf-8-sig (BOM), utf-8, else gb18030."""
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # Not final: the sample may end in the middle of a multi-byte character.
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+def _open_text(path, encoding=None):
+    encoding = encoding or detect_encoding(path)
+    return open(path, "r", encoding=encoding, newline=""), encoding
+
+
+def iter_csv_rows(path, encoding=None):
+    """Lazily yield the CSV's rows as dicts, decoding with the detected (or given) encoding."""
+    f, encoding = _open_text(path, encoding)
+    with f:
+        try:
+            for row in csv.DictReader(f):
+                yield row
+        except UnicodeDecodeError as e:
+            raise UnicodeDecodeError(
+                e.encoding, e.object, e.start, e.end,
+                "{} (detected {} from the first {} bytes of {})".format(e.reason, encoding, SAMPLE_BYTES, path),
+            )
+
+
+def split_bilingual(line):
+    """
+    (english, chinese) of a "English sentence 中文句子" line, or None.
+
+    The Chinese part starts at the first CJK character, moved back to the preceding
+    space so a leading number or Latin term stays with the Chinese text.
+    """
+    line = line.strip()
+    match = _CJK_RE.search(line)
+    if match is None:
+        return None
+    cut = match.start()
+    space = line.rfind(" ", 0, cut)
+    if space > 0:
+        cut = space
+    english, chinese = line[:cut].strip(), line[cut:].strip()
+    if not english or not chinese:
+        return None
+    return english, chinese
+
+
+def iter_text_pairs(path, encoding=None):
+    """Lazily yield (english, chinese) for every line of a bilingual text file that has both."""
+    f, _ = _open_text(path, encoding)
+    with f:
+        for line in f:
+            pair = split_bilingual(line)
+            if pair is not None:
+                yield pair
+
+
+def write_deck(rows, deck_path, meta=None):
+    """
+    Write rows (dicts or (english, chinese) pairs) as a compact JSONL deck plus a row index.
+
+    The first line holds `meta`; `<deck_path>.idx.npy` holds the byte offset of every row
+    and the end of file, so any row range is one seek and one read. Returns the row count.
+    """
+    offsets = []
+    tmp_path = deck_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps(dict(meta or {}, version=DECK_VERSION), ensure_ascii=False).encode("utf-8") + b"\n")
+        for row in rows:
+            if isinstance(row, dict):
+                row = [(row.get(field) or "").strip() for field in DECK_FIELDS]
+            offsets.append(f.tell())
+            f.write(json.dumps(dict(zip(DECK_FIELDS, row)), ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            f.write(b"\n")
+        offsets.append(f.tell())
+    np.save(deck_path + ".idx.tmp.npy", np.asarray(offsets, dtype=np.uint64))
+    os.replace(deck_path + ".idx.tmp.npy", deck_path + ".idx.npy")
+    os.replace(tmp_path, deck_path)
+    return len(offsets) - 1
+
+
+class Deck:
+    """Read side of write_deck: len() and row ranges without parsing the rest of the file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = np.load(path + ".idx.npy", mmap_mode="r")
+        with open(path, "rb") as f:
+            self.meta = json.loads(f.readline().decode("utf-8"))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def rows(self, start=0, stop=None):
+        """Rows [start, stop) (0-based) as dicts with DECK_FIELDS keys, parsed lazily."""
+        stop = len(self) if stop is None else min(int(stop), len(self))
+        start = max(0, int(start))
+        if start >= stop:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(int(self.offsets[start]))
+            for _ in range(stop - start):
+                yield json.loads(f.readline())
+
+
+def _source_meta(path):
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def open_deck(csv_path, deck_dir):
+    """
+    Deck for `csv_path` in `deck_dir`, rebuilt (one streaming pass) only when the CSV
+    changed since it was written.
+    """
+    meta = _source_meta(csv_path)
+    name = "{}-{}.jsonl".format(
+        os.path.splitext(os.path.basename(csv_path))[0],
+        hashlib.sha256(meta["source"].encode("utf-8")).hexdigest()[:12],
+    )
+    deck_path = os.path.join(deck_dir, name)
+    if os.path.exists(deck_path) and os.path.exists(deck_path + ".idx.npy"):
+        try:
+            deck = Deck(deck_path)
+            if all(deck.meta.get(k) == v for k, v in meta.items()) and deck.meta.get("version") == DECK_VERSION:
+                return deck
+        except (OSError, ValueError):
+            pass
+
+    os.makedirs(deck_dir, exist_ok=True)
+    encoding = detect_encoding(csv_path)
+    meta["encoding"] = encoding
+    write_deck(iter_csv_rows(csv_path, encoding), deck_path, meta)
+    return Deck(deck_path)
+
+
+def parse_row_range(value):
+    """'START:END' (1-based, inclusive, either side optional) -> (start, stop) 0-based half-open."""
+    start, sep, end = value.partition(":")
+    if not sep:
+        raise ValueError("expected START:END, got {!r}".format(value))
+    start = max(1, int(start)) if start.strip() else 1
+    stop = int(end) if end.strip() else None
+    if stop is not None and stop < start:
+        raise ValueError("empty row range {!r}".format(value))
+    return start - 1, stop
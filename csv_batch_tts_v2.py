@@ -1,74 +1,166 @@
 ﻿import os
 import sys
-import csv
+import time
+import shutil
 import argparse
-from pydub import AudioSegment
-from simple_tts_v2 import get_model, run_tts_with_model
-
-
-def format_srt_time(ms):
-    s, ms = divmod(int(ms), 1000)
-    m, s = divmod(s, 60)
-    h, m = divmod(m, 60)
-    return "{:02d}:{:02d}:{:02d},{:03d}".format(h, m, s, ms)
-
-
-def normalize_audio(seg, frame_rate, channels, sample_width):
-    if seg.frame_rate != frame_rate:
-        seg = seg.set_frame_rate(frame_rate)
-    if seg.channels != channels:
-        seg = seg.set_channels(channels)
-    if seg.sample_width != sample_width:
-        seg = seg.set_sample_width(sample_width)
-    return seg
+from itertools import islice
+from collections import Counter
+import numpy as np
+from simple_tts_v2 import get_model, run_tts_batch, TTSJob
+from synthesis_cache import SynthesisCache, model_fingerprint
+from speaker_cache import SpeakerConditioningCache
+from audio_timeline import AudioTimeline
+from audio_normalize import normalize
+from assembly_assets import AssetCache, silence, edge_fade
+from stream_writers import StreamingWavWriter, EncoderPipeWriter, SrtWriter, ENCODERS
+from worker_pool import SynthesisWorkerPool
+from job_manifest import job_hash
+from segment_store import SegmentStore
+from wav_io import read_wav
+from instrumentation import Tracer, NULL_TRACER, profiled
+from inference_profiles import add_profile_argument
+from corpus_ingest import detect_encoding, iter_csv_rows, Deck, open_deck, parse_row_range
+
+
+def normalize_audio(samples, sample_rate, frame_rate, channels, sample_width):
+    return normalize(samples, sample_rate, frame_rate, channels, sample_width)
 
 
 def make_silence(ms, frame_rate, channels, sample_width):
-    sil = AudioSegment.silent(duration=ms, frame_rate=frame_rate)
-    sil = sil.set_channels(channels)
-    sil = sil.set_sample_width(sample_width)
-    return sil
+    return silence(ms, frame_rate, channels, sample_width)
 
 
 def clean_quotes(text):
     return text.replace("\u2019", "'").replace("\u201c", '"').replace("\u201d", '"')
 
 
-def load_csv_rows_with_fallback(csv_path):
-    encodings = ["utf-8-sig", "utf-8", "gb18030", "gbk"]
-    last_err = None
-    for enc in encodings:
-        try:
-            with open(csv_path, mode="r", encoding=enc, newline="") as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-            print(">> CSV encoding detected: {}".format(enc))
-            return rows
-        except UnicodeDecodeError as e:
-            last_err = e
-            continue
-    if last_err:
-        raise last_err
-    raise RuntimeError("Failed to read CSV: {}".format(csv_path))
+def load_csv_rows_with_fallback(csv_path, start=0, stop=None):
+    """Rows [start, stop) of the CSV; reading stops at `stop`."""
+    encoding = detect_encoding(csv_path)
+    print(">> CSV encoding detected: {}".format(encoding))
+    return list(islice(iter_csv_rows(csv_path, encoding), start, stop))
 
 
-def maybe_edge_fade(seg, edge_fade_ms):
-    if edge_fade_ms <= 0:
-        return seg
-    if len(seg) <= edge_fade_ms * 2:
-        return seg
-    return seg.fade_in(edge_fade_ms).fade_out(edge_fade_ms)
+def load_row_range(csv_path, deck_dir=None, start=0, stop=None):
+    """
+    Rows [start, stop) of the input and the input's total row count.
 
+    With `deck_dir`, the CSV is preprocessed once into a deck there (see corpus_ingest)
+    and later runs read only the requested rows; a deck path is read directly. Without
+    either, the CSV is read only up to `stop`, so the total is None when `stop` is set.
+    """
+    if os.path.exists(csv_path + ".idx.npy"):
+        deck = Deck(csv_path)
+    elif deck_dir:
+        deck = open_deck(csv_path, deck_dir)
+    else:
+        rows = load_csv_rows_with_fallback(csv_path, start, stop)
+        return rows, (start + len(rows) if stop is None else None)
+    print(">> Deck: {} ({} rows)".format(deck.path, len(deck)))
+    return list(deck.rows(start, stop)), len(deck)
 
-def main():
+
+def maybe_edge_fade(samples, frame_rate, edge_fade_ms):
+    if edge_fade_ms <= 0:
+        return samples
+    return edge_fade(samples, frame_rate, edge_fade_ms)
+
+
+def plan_segment_jobs(rows, en_prompt, zh_prompt, first_row=1):
+    """
+    Collapse identical (clean_quotes(text), prompt) pairs across all rows into one synthesis job.
+    Rows are numbered from `first_row`, so job ids stay stable when a row range is processed.
+
+    Returns (row_plans, jobs, uses): row_plans holds (idx, en_text, zh_text, en_key, zh_key)
+    for every non-empty row, jobs maps each key to the (job_id, TTSJob) of its first
+    occurrence, and uses counts the segments the rows reference.
+    """
+    row_plans = []
+    jobs = {}
+    uses = 0
+    for i, row in enumerate(rows):
+        en_text = row.get("english", "").strip()
+        zh_text = row.get("chinese", "").strip()
+        if not en_text and not zh_text:
+            continue
+
+        idx = first_row + i
+        keys = []
+        for lang, text, prompt in (("en", en_text, en_prompt), ("zh", zh_text, zh_prompt)):
+            if not text:
+                keys.append(None)
+                continue
+            safe_text = clean_quotes(text)
+            key = (os.path.abspath(prompt), safe_text)
+            if key not in jobs:
+                job_id = "row_{}_{}".format(idx, lang)
+                jobs[key] = (job_id, TTSJob(prompt, safe_text, None))
+            keys.append(key)
+            uses += 1
+        row_plans.append((idx, en_text, zh_text, keys[0], keys[1]))
+    return row_plans, jobs, uses
+
+
+def load_segment(result, frame_rate, channels, sample_width, edge_fade_ms):
+    """Synthesis result (wav path or (sample_rate, samples)) as faded PCM frames in the target format."""
+    sample_rate, samples = read_wav(result) if isinstance(result, str) else result
+    out = normalize_audio(samples, sample_rate, frame_rate, channels, sample_width)
+    if edge_fade_ms > 0 and np.may_share_memory(out, samples):
+        # Already in the target format: fade a copy, not the caller's (or the store's read-only) buffer.
+        out = np.array(out)
+    return maybe_edge_fade(out, frame_rate, edge_fade_ms)
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description="CSV TTS v2 with smoother transitions and robust output")
     parser.add_argument("--csv", type=str, required=True, help="Input CSV file")
     parser.add_argument("--en_prompt", type=str, required=True, help="Reference audio for English")
     parser.add_argument("--zh_prompt", type=str, required=True, help="Reference audio for Chinese")
     parser.add_argument("--model_dir", type=str, required=True, help="Model checkpoints directory")
+    add_profile_argument(parser)
     parser.add_argument("--output", type=str, default="study_loop_merged_srt_v2.wav", help="Final merged wav file")
-    parser.add_argument("--temp_dir", type=str, default="temp_tts", help="Directory for temporary segments")
+    parser.add_argument("--temp_dir", type=str, default="temp_tts", help="Directory of the segment store")
+    parser.add_argument(
+        "--keep_temp",
+        action="store_true",
+        help="Also append every segment to the packed store in --temp_dir (segments.pcm + index; implied by --resume)",
+    )
+    parser.add_argument(
+        "--stream_output",
+        action="store_true",
+        help="Write the merged wav row by row instead of holding the whole track in memory",
+    )
+    parser.add_argument(
+        "--output_format",
+        choices=["wav"] + sorted(ENCODERS),
+        default="wav",
+        help="mp3/opus are encoded by ffmpeg while rows are synthesized; no intermediate wav is written",
+    )
+    parser.add_argument("--bitrate", type=str, default=None, help="Encoder bitrate, e.g. 128k (mp3/opus only)")
+    parser.add_argument("--ffmpeg", type=str, default="ffmpeg", help="ffmpeg executable for --output_format mp3/opus")
     parser.add_argument("--limit", type=int, default=None, help="Limit rows to process")
+    parser.add_argument(
+        "--rows",
+        type=parse_row_range,
+        default=None,
+        metavar="START:END",
+        help="Only process rows START..END (1-based, inclusive, either side optional); combines with --limit",
+    )
+    parser.add_argument(
+        "--no_deck",
+        action="store_true",
+        help="Parse the CSV directly instead of the preprocessed deck kept in <cache_dir>/decks",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse segments stored as done in <temp_dir> with matching text hashes (implies --keep_temp)",
+    )
+    parser.add_argument(
+        "--reexport",
+        action="store_true",
+        help="Rebuild the output from the segment store of an earlier run without loading the model (implies --resume)",
+    )
     parser.add_argument("--ding", type=str, default="ding.mp3", help="Path to notification sound")
 
     parser.add_argument("--target_sr", type=int, default=22050, help="Target sample rate")
@@ -86,17 +178,112 @@ def main():
 
     parser.add_argument("--non_stable", action="store_true", help="Use stochastic decoding")
     parser.add_argument("--max_retries", type=int, default=2, help="Retry count per sentence")
+    parser.add_argument(
+        "--retries_per_batch",
+        type=int,
+        default=None,
+        help="Retries shared by all sentences of one --batch_size window (default: unlimited)",
+    )
     parser.add_argument("--seed", type=int, default=None)
     parser.add_argument("--no_quality_check", action="store_true")
-
-    args = parser.parse_args()
-
-    if not os.path.exists(args.temp_dir):
-        os.makedirs(args.temp_dir)
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1,
+        help="Rows synthesized per batch before assembly (grouped by prompt)",
+    )
+    parser.add_argument(
+        "--length_buckets",
+        action="store_true",
+        help="Run each batch shortest first with per-length max_mel_tokens caps",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Synthesis worker processes, each with its own model copy (CPU hosts)",
+    )
+    parser.add_argument(
+        "--threads_per_worker",
+        type=int,
+        default=None,
+        help="Torch threads per worker (default: cpu_count // workers)",
+    )
+
+    parser.add_argument("--cache_dir", type=str, default="tts_cache", help="Persistent synthesis cache directory")
+    parser.add_argument("--cache_max_mb", type=int, default=2048, help="Synthesis cache size limit (LRU eviction)")
+    parser.add_argument("--no_cache", action="store_true", help="Disable the synthesis cache")
+    parser.add_argument(
+        "--persist_speaker_cond",
+        action="store_true",
+        help="Save prompt speaker conditioning next to each prompt (<prompt>.spk.npz) for later runs",
+    )
+
+    parser.add_argument("--trace", type=str, default=None, help="Write a JSONL trace of stages, syntheses and rows")
+    parser.add_argument("--cprofile", type=str, default=None, help="Run under cProfile and dump pstats to this path")
+    parser.add_argument(
+        "--torch_profile",
+        type=str,
+        default=None,
+        help="Run under torch.profiler and export a chrome trace to this path",
+    )
+
+    return parser
+
+
+def run(args, tts_model=None, tracer=NULL_TRACER):
+    """Run the CSV pipeline for parsed `args`; `tts_model` replaces get_model() (benchmark.py passes a fake)."""
+    if args.output_format != "wav":
+        if shutil.which(args.ffmpeg) is None:
+            print("CRITICAL: --output_format {} needs ffmpeg, not found: {}".format(args.output_format, args.ffmpeg))
+            sys.exit(1)
+        root, ext = os.path.splitext(args.output)
+        if ext.lower() != "." + args.output_format:
+            args.output = root + "." + args.output_format
+
+    args.resume = args.resume or args.reexport
+    keep_temp = args.keep_temp or args.resume
+
+    synth_cache = None
+    if not args.no_cache:
+        synth_cache = SynthesisCache(
+            args.cache_dir,
+            args.model_dir,
+            max_bytes=int(args.cache_max_mb) * 1024 * 1024,
+            profile=args.profile,
+        )
+
+    speaker_cache = SpeakerConditioningCache(persist=args.persist_speaker_cond)
+
+    run_kwargs = {
+        "stable_mode": not args.non_stable,
+        "max_retries": args.max_retries,
+        "seed": args.seed,
+        "quality_check": not args.no_quality_check,
+        "cache": synth_cache,
+        "speaker_cache": speaker_cache,
+    }
 
     print(">> Initializing TTS system...")
+    pool = None
     try:
-        tts_model = get_model(args.model_dir)
+        if args.reexport:
+            print(">> Re-exporting from {}; segments missing there are skipped".format(args.temp_dir))
+        elif args.workers > 1:
+            print(">> Starting {} synthesis workers...".format(args.workers))
+            pool = SynthesisWorkerPool(
+                args.model_dir,
+                args.workers,
+                threads_per_worker=args.threads_per_worker,
+                profile=args.profile,
+                **run_kwargs,
+            )
+        else:
+            if tts_model is None:
+                tts_model = get_model(args.model_dir, profile=args.profile)
+            for prompt in (args.en_prompt, args.zh_prompt):
+                if speaker_cache.prepare(tts_model, prompt):
+                    print(">> Loaded cached speaker conditioning: {}".format(prompt))
     except Exception as e:
         print("CRITICAL: Failed to load model:", e)
         sys.exit(1)
@@ -108,24 +295,44 @@ def main():
     ding_sound = None
     if (not args.no_ding) and os.path.exists(args.ding):
         try:
-            ding_sound = AudioSegment.from_file(args.ding)
-            ding_sound = normalize_audio(ding_sound, target_sr, target_channels, target_sw)
-            if args.ding_gain_db:
-                ding_sound = ding_sound + float(args.ding_gain_db)
-            if args.ding_fade_in_ms > 0:
-                ding_sound = ding_sound.fade_in(args.ding_fade_in_ms)
-            if args.ding_fade_out_ms > 0:
-                ding_sound = ding_sound.fade_out(args.ding_fade_out_ms)
+            # Rendered once per (ding file, target format, gain, fades) and reused from --cache_dir.
+            ding_sound = AssetCache(os.path.join(args.cache_dir, "assets")).ding(
+                args.ding,
+                target_sr,
+                target_channels,
+                target_sw,
+                gain_db=args.ding_gain_db,
+                fade_in_ms=max(0, args.ding_fade_in_ms),
+                fade_out_ms=max(0, args.ding_fade_out_ms),
+            )
         except Exception as e:
             print("Warning: Could not load or process ding sound:", e)
             ding_sound = None
 
-    combined_audio = AudioSegment.silent(duration=0, frame_rate=target_sr)
-    combined_audio = combined_audio.set_channels(target_channels).set_sample_width(target_sw)
-
-    srt_entries = []
-    current_time_ms = 0
-    srt_counter = 1
+    wav_writer = None
+    if args.output_format != "wav":
+        wav_writer = EncoderPipeWriter(
+            args.output,
+            target_sr,
+            target_channels,
+            target_sw,
+            args.output_format,
+            bitrate=args.bitrate,
+            ffmpeg=args.ffmpeg,
+        )
+    elif args.stream_output:
+        wav_writer = StreamingWavWriter(args.output, target_sr, target_channels, target_sw)
+    timeline = AudioTimeline(target_sr, target_channels, target_sw, sink=wav_writer)
+
+    srt_path = os.path.splitext(args.output)[0] + ".srt"
+    srt_writer = SrtWriter(srt_path)
+
+    store = None
+    model_fp = None
+    if keep_temp:
+        store = SegmentStore(args.temp_dir, resume=args.resume)
+        model_fp = synth_cache.model_fp if synth_cache is not None else model_fingerprint(args.model_dir)
+    resumed_count = 0
 
     silence_short = make_silence(args.silence_short_ms, target_sr, target_channels, target_sw)
     silence_long = make_silence(args.silence_long_ms, target_sr, target_channels, target_sw)
@@ -133,111 +340,158 @@ def main():
     print(">> Reading CSV and generating audio...")
 
     try:
-        rows = load_csv_rows_with_fallback(args.csv)
+        start, stop = args.rows or (0, None)
         if args.limit:
-            rows = rows[:args.limit]
-
-        for i, row in enumerate(rows):
-            en_text = row.get("english", "").strip()
-            zh_text = row.get("chinese", "").strip()
-            if not en_text and not zh_text:
-                continue
-
-            idx = i + 1
-            print("\n--- [Row {}/{}] ---".format(idx, len(rows)))
-
-            en_wav = os.path.join(args.temp_dir, "row_{}_en.wav".format(idx))
-            zh_wav = os.path.join(args.temp_dir, "row_{}_zh.wav".format(idx))
-            en_audio, zh_audio = None, None
-
-            safe_en = clean_quotes(en_text)
-            if run_tts_with_model(
-                tts_model,
-                args.en_prompt,
-                safe_en,
-                en_wav,
-                stable_mode=not args.non_stable,
-                max_retries=args.max_retries,
-                seed=args.seed,
-                quality_check=not args.no_quality_check,
-            ):
-                en_audio = AudioSegment.from_wav(en_wav)
-                en_audio = normalize_audio(en_audio, target_sr, target_channels, target_sw)
-                en_audio = maybe_edge_fade(en_audio, args.edge_fade_ms)
-
-            safe_zh = clean_quotes(zh_text)
-            if run_tts_with_model(
-                tts_model,
-                args.zh_prompt,
-                safe_zh,
-                zh_wav,
-                stable_mode=not args.non_stable,
-                max_retries=args.max_retries,
-                seed=args.seed,
-                quality_check=not args.no_quality_check,
-            ):
-                zh_audio = AudioSegment.from_wav(zh_wav)
-                zh_audio = normalize_audio(zh_audio, target_sr, target_channels, target_sw)
-                zh_audio = maybe_edge_fade(zh_audio, args.edge_fade_ms)
-
-            if en_audio:
-                en_duration = len(en_audio)
-                start_ms = current_time_ms
-
-                for _ in range(3):
-                    combined_audio += en_audio + silence_short
-                    current_time_ms += en_duration + args.silence_short_ms
-
-                end_ms = current_time_ms
-                srt_entries.append(
-                    "{}\n{} --> {}\n{}\n".format(
-                        srt_counter,
-                        format_srt_time(start_ms),
-                        format_srt_time(end_ms),
-                        en_text,
-                    )
-                )
-                srt_counter += 1
-
-            if zh_audio and en_audio:
-                zh_duration = len(zh_audio)
-                en_duration = len(en_audio)
-                start_ms = current_time_ms
-
-                combined_audio += zh_audio + silence_short
-                current_time_ms += zh_duration + args.silence_short_ms
-
-                combined_audio += en_audio + silence_short
-                current_time_ms += en_duration + args.silence_short_ms
-
-                end_ms = current_time_ms
-                combined_text = "{}\n{}".format(en_text, zh_text)
-                srt_entries.append(
-                    "{}\n{} --> {}\n{}\n".format(
-                        srt_counter,
-                        format_srt_time(start_ms),
-                        format_srt_time(end_ms),
-                        combined_text,
-                    )
+            stop = start + args.limit if stop is None else min(stop, start + args.limit)
+        with tracer.stage("csv_load"):
+            deck_dir = None if args.no_deck else os.path.join(args.cache_dir, "decks")
+            rows, total_rows = load_row_range(args.csv, deck_dir, start, stop)
+
+        with tracer.stage("plan"):
+            row_plans, planned_jobs, segment_uses = plan_segment_jobs(
+                rows, args.en_prompt, args.zh_prompt, first_row=start + 1
+            )
+        print(
+            ">> Planned {} synthesis jobs for {} segments ({} duplicate inferences saved)".format(
+                len(planned_jobs), segment_uses, segment_uses - len(planned_jobs)
+            )
+        )
+        # Synthesized audio is held only until the last row that uses it is assembled.
+        remaining_uses = Counter(key for plan in row_plans for key in plan[3:] if key is not None)
+
+        batch_size = max(1, int(args.batch_size))
+        if pool is not None and batch_size < pool.workers:
+            # Each row yields up to two jobs; keep every worker busy within a batch.
+            batch_size = pool.workers
+
+        segments = {}
+        total_label = total_rows if total_rows is not None else "?"
+        for window_start in range(0, len(row_plans), batch_size):
+            window = row_plans[window_start:window_start + batch_size]
+            window_started = time.perf_counter()
+            if batch_size == 1:
+                print("\n--- [Row {}/{}] ---".format(window[0][0], total_label))
+            else:
+                print("\n--- [Rows {}-{}/{}] ---".format(window[0][0], window[-1][0], total_label))
+
+            keys = []
+            for plan in window:
+                for key in plan[3:]:
+                    if key is not None and key not in segments and key not in keys:
+                        keys.append(key)
+
+            hashes = {}
+            pending = []
+            for key in keys:
+                job_id, job = planned_jobs[key]
+                hashes[key] = job_hash(
+                    job.prompt_wav,
+                    job.text,
+                    model_fp=model_fp,
+                    profile=args.profile,
+                    stable_mode=not args.non_stable,
+                    seed=args.seed,
                 )
-                srt_counter += 1
-
-            if ding_sound:
-                combined_audio += ding_sound
-                current_time_ms += len(ding_sound)
-
-            combined_audio += silence_long
-            current_time_ms += args.silence_long_ms
-
-        if len(combined_audio) > 0:
-            print("\n>> Exporting audio: {}".format(args.output))
-            combined_audio.export(args.output, format="wav")
-
-            srt_path = os.path.splitext(args.output)[0] + ".srt"
-            print(">> Exporting subtitles: {}".format(srt_path))
-            with open(srt_path, "w", encoding="utf-8") as f_srt:
-                f_srt.write("\n".join(srt_entries))
-
+                segments[key] = store.get(hashes[key]) if store is not None else None
+                if segments[key] is None:
+                    pending.append(key)
+            resumed_count += len(keys) - len(pending)
+
+            if pending and args.reexport:
+                for key in pending:
+                    print("Warning: {} is not in the segment store, skipped".format(planned_jobs[key][0]))
+            elif pending:
+                pending_jobs = [planned_jobs[key][1]._replace(output_path=None) for key in pending]
+                with tracer.stage("synthesize"):
+                    if pool is not None:
+                        synthesized = pool.run(
+                            pending_jobs,
+                            length_buckets=args.length_buckets,
+                            retries_per_batch=args.retries_per_batch,
+                        )
+                    else:
+                        synthesized = run_tts_batch(
+                            tts_model,
+                            pending_jobs,
+                            batch_size=len(pending_jobs),
+                            length_buckets=args.length_buckets,
+                            retries_per_batch=args.retries_per_batch,
+                            tracer=tracer,
+                            **run_kwargs,
+                        )
+
+                with tracer.stage("segment_store"):
+                    for key, result in zip(pending, synthesized):
+                        segments[key] = result
+                        if store is None:
+                            continue
+                        job_id = planned_jobs[key][0]
+                        if result:
+                            # Assemble from the store's mapping and let the synthesized array go.
+                            segments[key] = store.put(hashes[key], *result, job_id=job_id)
+                        else:
+                            store.record_failed(hashes[key], job_id=job_id)
+
+            # Synthesis time of the window is shared evenly by its rows for the per-row RTF.
+            window_share = (time.perf_counter() - window_started) / len(window)
+            loaded = {}
+            for idx, en_text, zh_text, en_key, zh_key in window:
+                row_started = time.perf_counter()
+                with tracer.stage("load_segment"):
+                    for key in (en_key, zh_key):
+                        if key is None:
+                            continue
+                        if key not in loaded and segments[key]:
+                            loaded[key] = load_segment(
+                                segments[key], target_sr, target_channels, target_sw, args.edge_fade_ms
+                            )
+                        remaining_uses[key] -= 1
+                        if remaining_uses[key] == 0:
+                            del segments[key]
+                en_audio = loaded.get(en_key)
+                zh_audio = loaded.get(zh_key)
+                with tracer.stage("assemble"):
+                    if en_audio is not None:
+                        start_ms = timeline.duration_ms
+
+                        for _ in range(3):
+                            timeline.append(en_audio)
+                            timeline.append(silence_short)
+
+                        end_ms = timeline.duration_ms
+                        srt_writer.write(start_ms, end_ms, en_text)
+
+                    if zh_audio is not None and en_audio is not None:
+                        start_ms = timeline.duration_ms
+
+                        timeline.append(zh_audio)
+                        timeline.append(silence_short)
+
+                        timeline.append(en_audio)
+                        timeline.append(silence_short)
+
+                        end_ms = timeline.duration_ms
+                        combined_text = "{}\n{}".format(en_text, zh_text)
+                        srt_writer.write(start_ms, end_ms, combined_text)
+
+                    if ding_sound is not None:
+                        timeline.append(ding_sound)
+
+                    timeline.append(silence_long)
+                    timeline.flush()
+
+                speech_frames = sum(len(audio) for audio in (en_audio, zh_audio) if audio is not None)
+                tracer.row(idx, speech_frames / float(target_sr), window_share + time.perf_counter() - row_started)
+
+        if timeline.total_frames > 0:
+            if wav_writer is None:
+                print("\n>> Exporting audio: {}".format(args.output))
+                with tracer.stage("export"):
+                    timeline.export_wav(args.output)
+            else:
+                print("\n>> Streamed audio: {}".format(args.output))
+
+            print(">> Subtitles: {}".format(srt_path))
             print(">> All done (v2).")
         else:
             print(">> No audio generated.")
@@ -246,6 +500,37 @@ def main():
         print("Error:", e)
         import traceback
         traceback.print_exc()
+    finally:
+        if resumed_count:
+            print(">> Resumed {} segments from {}".format(resumed_count, store.pcm_path))
+        if store is not None:
+            store.close()
+        if pool is not None:
+            pool.terminate()
+        if wav_writer is not None:
+            try:
+                wav_writer.close()
+            except RuntimeError as e:
+                print("Error:", e)
+        srt_writer.close()
+
+    if synth_cache is not None:
+        print(">> " + synth_cache.summary())
+
+
+def main(argv=None, tts_model=None):
+    """CLI entry point; returns the Tracer summary (stage timings, counters, RTF) of the run."""
+    args = build_parser().parse_args(argv)
+    tracer = Tracer(args.trace)
+    try:
+        with profiled(args.cprofile, args.torch_profile):
+            run(args, tts_model=tts_model, tracer=tracer)
+    finally:
+        tracer.close()
+    print("\n" + tracer.summary_table())
+    if tracer.trace_path:
+        print(">> Trace: {}".format(tracer.trace_path))
+    return tracer.summary()
 
 
 if __name__ == "__main__":
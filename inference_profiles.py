@@ -0,0 +1,205 @@
+import os
+import time
+import tempfile
+import contextlib
+from collections import namedtuple
+
+import numpy as np
+
+
+InferenceProfile = namedtuple(
+    "InferenceProfile",
+    ["name", "device", "quantize_int8", "bf16", "threads", "interop_threads", "mmap_load", "warmup"],
+)
+
+# device None lets IndexTTS2 pick (CUDA with fp16 when present); threads 0 means every CPU
+# this process may run on, None leaves torch's default.
+PROFILES = {
+    "default": InferenceProfile("default", None, False, False, None, None, False, False),
+    "cpu-fast": InferenceProfile("cpu-fast", "cpu", True, True, 0, 1, True, True),
+}
+
+# Submodules whose Linear (and GPT-2 Conv1D) layers get dynamic int8 weights. The GPT
+# decodes one mel token at a time and dominates CPU time; the others run once per prompt
+# or are convolutional.
+QUANTIZE_MODULES = ("gpt",)
+# (submodule, method) pairs run under bf16 autocast on CPUs with native bf16 support.
+BF16_METHODS = (("s2mel.models.cfm", "inference"), ("bigvgan", "forward"))
+
+WARMUP_TEXT = "Warm-up sentence, 你好。"
+WARMUP_MEL_TOKENS = 64
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name or "default"]
+    except KeyError:
+        raise ValueError("unknown inference profile {!r} (choose from {})".format(name, ", ".join(sorted(PROFILES))))
+
+
+def add_profile_argument(parser):
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default="default",
+        help="Inference profile; cpu-fast = int8 GPT, bf16 s2mel/vocoder, tuned threads, mmap loading, warm-up",
+    )
+
+
+def _available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_threads(profile, threads=None):
+    """Apply the profile's torch thread counts; an explicit `threads` (e.g. a pool worker's share) wins."""
+    import torch
+
+    if threads is None and profile.threads is not None:
+        threads = profile.threads or _available_cpus()
+    if threads:
+        torch.set_num_threads(int(threads))
+    if profile.interop_threads:
+        try:
+            torch.set_num_interop_threads(profile.interop_threads)
+        except RuntimeError:
+            # Only settable before the first inter-op parallel work in this process.
+            pass
+
+
+@contextlib.contextmanager
+def mmap_checkpoints(enabled=True):
+    """Make torch.load memory-map checkpoints while IndexTTS2 loads, falling back where unsupported."""
+    if not enabled:
+        yield
+        return
+    import torch
+
+    orig_load = torch.load
+
+    def load(f, *args, **kwargs):
+        if "mmap" in kwargs or not isinstance(f, (str, os.PathLike)):
+            return orig_load(f, *args, **kwargs)
+        try:
+            return orig_load(f, *args, mmap=True, **kwargs)
+        except (TypeError, RuntimeError, ValueError):
+            # Old torch or a legacy (non-zipfile) checkpoint.
+            return orig_load(f, *args, **kwargs)
+
+    torch.load = load
+    try:
+        yield
+    finally:
+        torch.load = orig_load
+
+
+def _resolve(obj, path):
+    for name in path.split("."):
+        obj = getattr(obj, name, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def _conv1d_to_linear(module):
+    """Swap transformers' GPT-2 Conv1D layers (x @ W + b) for equivalent nn.Linear so they can be quantized."""
+    import torch
+
+    try:
+        from transformers.pytorch_utils import Conv1D
+    except ImportError:
+        return 0
+    swapped = 0
+    for name, child in list(module.named_children()):
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features, bias=child.bias is not None)
+            with torch.no_grad():
+                linear.weight.copy_(child.weight.t())
+                if child.bias is not None:
+                    linear.bias.copy_(child.bias)
+            setattr(module, name, linear)
+            swapped += 1
+        else:
+            swapped += _conv1d_to_linear(child)
+    return swapped
+
+
+def _cpu_bf16_supported():
+    import torch
+
+    for probe in (
+        lambda: torch.ops.mkldnn._is_mkldnn_bf16_supported(),
+        lambda: torch.backends.cpu.get_cpu_capability() in ("AVX512_BF16", "AMX"),
+    ):
+        try:
+            return bool(probe())
+        except Exception:
+            continue
+    return False
+
+
+def _autocast_method(obj, name, dtype):
+    import torch
+
+    method = getattr(obj, name)
+
+    def wrapped(*args, **kwargs):
+        with torch.autocast("cpu", dtype=dtype):
+            out = method(*args, **kwargs)
+        if isinstance(out, torch.Tensor) and out.dtype == dtype:
+            out = out.float()
+        return out
+
+    setattr(obj, name, wrapped)
+
+
+def optimize_model(tts, profile):
+    """Apply the profile's in-place model optimizations; returns a description of each one applied."""
+    import torch
+
+    applied = []
+    if profile.quantize_int8:
+        for path in QUANTIZE_MODULES:
+            module = _resolve(tts, path)
+            if not isinstance(module, torch.nn.Module):
+                continue
+            swapped = _conv1d_to_linear(module)
+            torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+            applied.append("int8 {} ({} Conv1D converted)".format(path, swapped))
+
+    if profile.bf16:
+        if _cpu_bf16_supported():
+            for path, method in BF16_METHODS:
+                target = _resolve(tts, path)
+                if target is not None and hasattr(target, method):
+                    _autocast_method(target, method, torch.bfloat16)
+                    applied.append("bf16 {}.{}".format(path, method))
+        else:
+            applied.append("bf16 skipped (no native CPU support)")
+    return applied
+
+
+def warm_up(tts, text=WARMUP_TEXT):
+    """One short synthesis with a generated prompt so lazy initialization is not paid by the first row."""
+    from wav_io import write_wav
+
+    sample_rate = 16000
+    t = np.arange(sample_rate * 2) / float(sample_rate)
+    tone = 0.2 * np.sin(2 * np.pi * 180.0 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3.0 * t))
+    fd, prompt = tempfile.mkstemp(suffix=".wav", prefix="tts_warmup_")
+    os.close(fd)
+    started = time.perf_counter()
+    try:
+        write_wav(prompt, sample_rate, (tone * 32767).astype(np.int16))
+        tts.infer(
+            spk_audio_prompt=prompt,
+            text=text,
+            output_path=None,
+            verbose=False,
+            max_mel_tokens=WARMUP_MEL_TOKENS,
+        )
+    finally:
+        os.remove(prompt)
+    return time.perf_counter() - started
@@ -0,0 +1,147 @@
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager, ExitStack
+
+
+class Tracer:
+    """
+    Per-stage wall clock totals, counters and per-row real-time factors for one run.
+
+    `stage(name)` is a context manager; stages may nest (e.g. "infer" inside "synthesize"),
+    so their shares of the total wall time can add up to more than 100%. With `trace_path`
+    every stage, synthesis and row is also appended to a JSONL trace as it happens.
+    RTF here is audio seconds produced per wall second (higher is faster).
+    """
+
+    def __init__(self, trace_path=None, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = Counter()
+        self.rows = 0
+        self.audio_s = 0.0
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._trace = open(trace_path, "w", encoding="utf-8") if (enabled and trace_path) else None
+        self.trace_path = trace_path if self._trace else None
+
+    @contextmanager
+    def stage(self, name, **fields):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                totals = self.stages.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += seconds
+            if self._trace is not None:
+                self.event("stage", stage=name, seconds=round(seconds, 6), **fields)
+
+    def count(self, name, n=1):
+        if self.enabled and n:
+            with self._lock:
+                self.counters[name] += n
+
+    def event(self, kind, **fields):
+        if self._trace is None:
+            return
+        record = {"t": round(time.perf_counter() - self._started, 6), "event": kind}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._trace.write(line + "\n")
+
+    def row(self, idx, audio_s, wall_s, **fields):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.rows += 1
+            self.audio_s += audio_s
+        rtf = round(audio_s / wall_s, 3) if wall_s > 0 else None
+        self.event("row", row=idx, audio_s=round(audio_s, 3), wall_s=round(wall_s, 6), rtf=rtf, **fields)
+
+    def summary(self):
+        wall = time.perf_counter() - self._started
+        return {
+            "wall_s": round(wall, 4),
+            "rows": self.rows,
+            "audio_s": round(self.audio_s, 3),
+            "rtf": round(self.audio_s / wall, 3) if wall > 0 else None,
+            "stages": {
+                name: {"calls": calls, "seconds": round(seconds, 6)}
+                for name, (calls, seconds) in self.stages.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def summary_table(self):
+        summary = self.summary()
+        wall = summary["wall_s"] or 1e-9
+        lines = [
+            "{:<20} {:>8} {:>10} {:>10} {:>7}".format("stage", "calls", "total s", "mean ms", "% wall"),
+            "-" * 59,
+        ]
+        for name, (calls, seconds) in sorted(self.stages.items(), key=lambda kv: -kv[1][1]):
+            lines.append(
+                "{:<20} {:>8} {:>10.3f} {:>10.2f} {:>6.1f}%".format(
+                    name, calls, seconds, seconds * 1000.0 / max(1, calls), 100.0 * seconds / wall
+                )
+            )
+        lines.append("-" * 59)
+        lines.append(
+            "wall {:.2f}s, {} rows, {:.1f}s audio, RTF {}".format(
+                summary["wall_s"], summary["rows"], summary["audio_s"], summary["rtf"]
+            )
+        )
+        if self.counters:
+            lines.append(", ".join("{} {}".format(k, v) for k, v in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+    def close(self):
+        if self._trace is not None:
+            self.event("summary", **self.summary())
+            self._trace.close()
+            self._trace = None
+
+
+NULL_TRACER = Tracer(enabled=False)
+
+
+@contextmanager
+def profiled(cprofile_path=None, torch_trace_path=None, top=25):
+    """Optionally run the body under cProfile (dumped as pstats) and/or torch.profiler (chrome trace)."""
+    profiler = None
+    with ExitStack() as stack:
+        if torch_trace_path:
+            import torch
+            from torch.profiler import profile, ProfilerActivity
+
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            torch_prof = stack.enter_context(profile(activities=activities))
+        if cprofile_path:
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+    if profiler is not None:
+        import pstats
+
+        profiler.dump_stats(cprofile_path)
+        print(">> cProfile stats: {}".format(cprofile_path))
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+    if torch_trace_path:
+        torch_prof.export_chrome_trace(torch_trace_path)
+        print(">> torch profiler trace: {}".format(torch_trace_path))
@@ -0,0 +1,18 @@
+import json
+import hashlib
+
+from synthesis_cache import file_content_hash, normalize_text
+
+
+def job_hash(prompt_wav, text, model_fp=None, profile="default", **settings):
+    # model_fp is synthesis_cache.model_fingerprint(model_dir), computed once per run by the caller.
+    payload = {
+        "text": normalize_text(text),
+        "prompt": file_content_hash(prompt_wav),
+        "model": model_fp,
+        "profile": profile,
+        "settings": settings,
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
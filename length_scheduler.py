@@ -0,0 +1,77 @@
+import re
+
+
+# The IndexTTS2 GPT stage emits semantic/mel tokens at roughly 50 per second of audio.
+MEL_TOKENS_PER_SECOND = 50
+MEL_TOKEN_BUCKETS = (256, 384, 512, 768, 1024)
+DEFAULT_MAX_MEL_TOKENS = 1024
+# IndexTTS2.infer splits text into segments of this many BPE tokens and applies
+# max_mel_tokens to each segment, not to the whole text.
+MAX_TEXT_TOKENS_PER_SEGMENT = 120
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_WORD_RE = re.compile(r"[A-Za-z0-9']+")
+_PAUSE_RE = re.compile(r"[,.;:!?\u3001\u3002\uff0c\uff1b\uff1a\uff01\uff1f]")
+
+
+def estimate_seconds(text):
+    cjk_chars = len(_CJK_RE.findall(text))
+    words = len(_WORD_RE.findall(_CJK_RE.sub(" ", text)))
+    pauses = len(_PAUSE_RE.findall(text))
+    return 0.3 + cjk_chars / 4.0 + words / 2.5 + pauses * 0.25
+
+
+def estimate_mel_tokens(text):
+    return int(estimate_seconds(text) * MEL_TOKENS_PER_SECOND)
+
+
+def estimate_text_tokens(text):
+    """Generous BPE token estimate: one per CJK character and pause, 1.5 per word."""
+    cjk_chars = len(_CJK_RE.findall(text))
+    words = len(_WORD_RE.findall(_CJK_RE.sub(" ", text)))
+    pauses = len(_PAUSE_RE.findall(text))
+    return int(cjk_chars + words * 1.5 + pauses)
+
+
+def fits_one_segment(text, max_text_tokens=MAX_TEXT_TOKENS_PER_SEGMENT):
+    return estimate_text_tokens(text) <= max_text_tokens
+
+
+def bucket_max_mel_tokens(text, headroom=2.0, ceiling=DEFAULT_MAX_MEL_TOKENS):
+    """Smallest bucket that fits the estimated length with `headroom`, capped at `ceiling`."""
+    needed = estimate_mel_tokens(text) * headroom
+    for bucket in MEL_TOKEN_BUCKETS:
+        if bucket > ceiling:
+            break
+        if bucket >= needed:
+            return bucket
+    return ceiling
+
+
+def group_by_prompt(items):
+    """Indices of (prompt_wav, text, ...) items grouped by prompt in order of first appearance."""
+    prompt_rank = {}
+    ranks = [prompt_rank.setdefault(item[0], len(prompt_rank)) for item in items]
+    return sorted(range(len(items)), key=ranks.__getitem__)
+
+
+def schedule(items):
+    """
+    Run order for (prompt_wav, text, ...) items: grouped by prompt in order of first
+    appearance, then by mel-token bucket and estimated length, shortest first.
+
+    Returns (order, max_mel_tokens) where `order` lists item indices and
+    `max_mel_tokens[i]` is the decode cap for item i.
+    """
+    prompt_rank = {}
+    keys = []
+    max_mel_tokens = []
+    for i, item in enumerate(items):
+        prompt_wav, text = item[0], item[1]
+        rank = prompt_rank.setdefault(prompt_wav, len(prompt_rank))
+        bucket = bucket_max_mel_tokens(text)
+        max_mel_tokens.append(bucket)
+        keys.append((rank, bucket, estimate_mel_tokens(text), i))
+
+    order = [key[-1] for key in sorted(keys)]
+    return order, max_mel_tokens
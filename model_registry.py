@@ -0,0 +1,228 @@
+import os
+import gc
+import sys
+import time
+import threading
+import contextlib
+from collections import OrderedDict
+
+
+CHECKPOINT_EXTENSIONS = (".pth", ".pt", ".bin", ".safetensors", ".ckpt")
+
+
+def budget_from_env(name="TTS_MODEL_BUDGET_MB"):
+    """Memory budget in bytes from e.g. TTS_MODEL_BUDGET_MB=6000; None (unlimited) when unset."""
+    value = os.environ.get(name, "").strip()
+    return int(float(value) * 1024 * 1024) if value else None
+
+
+def checkpoint_bytes(model_dir):
+    """Size of the checkpoint files in `model_dir`: the load-time estimate for a model never loaded before."""
+    total = 0
+    for root, _, files in os.walk(model_dir):
+        for name in files:
+            if name.endswith(CHECKPOINT_EXTENSIONS):
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+    return total
+
+
+def _tensors(value):
+    if isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _tensors(item)
+    elif hasattr(value, "data_ptr") and hasattr(value, "element_size"):
+        yield value
+
+
+def model_bytes(model):
+    """Bytes held by the torch tensors of the modules among `model`'s attributes (0 for clients)."""
+    torch = sys.modules.get("torch")
+    if torch is None or not hasattr(torch, "nn"):
+        return 0
+    seen = set()
+    total = 0
+    for value in vars(model).values():
+        if not isinstance(value, torch.nn.Module):
+            continue
+        # quantize_dynamic keeps int8 Linear weights in _packed_params, which parameters() and
+        # buffers() skip; state_dict() has them (as a (weight, bias) tuple).
+        tensors = list(value.parameters()) + list(value.buffers()) + list(value.state_dict().values())
+        for tensor in _tensors(tensors):
+            if tensor.data_ptr() in seen:
+                continue
+            seen.add(tensor.data_ptr())
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _Entry:
+    __slots__ = ("model", "bytes", "refs", "pinned", "loaded_at")
+
+    def __init__(self, model, size):
+        self.model = model
+        self.bytes = size
+        self.refs = 0
+        self.pinned = False
+        self.loaded_at = time.time()
+
+
+class ModelRegistry:
+    """
+    Loaded models keyed by (model_dir, profile), loaded on first use by `loader`.
+
+    Models in use are reference counted (acquire/release or the lease() context manager);
+    when a load would exceed `budget_bytes`, idle models are evicted least recently used
+    first. Models in use or pinned are never evicted, so the budget can be exceeded when
+    everything resident is busy; that is reported rather than failing the request.
+    Checkpoints load outside the registry lock, so stats() and other models' acquire/release
+    never wait on a load.
+    """
+
+    def __init__(self, loader, budget_bytes=None, size_fn=model_bytes):
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.size_fn = size_fn
+        self.entries = OrderedDict()
+        self.known_sizes = {}
+        self.loads = 0
+        self.evictions = 0
+        # Called as fn(key, model) when a model is evicted, e.g. to drop caches tied to it.
+        self.evict_callbacks = []
+        # The lock only guards bookkeeping; checkpoints load outside it, one loader per key,
+        # with other callers for that key waiting on its event.
+        self._lock = threading.RLock()
+        self._loading = {}
+        self._reserved = {}
+
+    @staticmethod
+    def key(model_dir, profile="default"):
+        return (os.path.abspath(model_dir), profile or "default")
+
+    def resident_bytes(self):
+        return sum(entry.bytes for entry in self.entries.values()) + sum(self._reserved.values())
+
+    def _checkout(self, key, entry, pin):
+        self.entries.move_to_end(key)
+        if pin:
+            entry.pinned = True
+        else:
+            entry.refs += 1
+        return entry.model
+
+    def acquire(self, model_dir, profile="default", pin=False, **load_kwargs):
+        """The model for (model_dir, profile), loading it if needed; call release() when done unless pinned."""
+        key = self.key(model_dir, profile)
+        while True:
+            with self._lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    return self._checkout(key, entry, pin)
+                event = self._loading.get(key)
+                if event is None:
+                    event = self._loading[key] = threading.Event()
+                    estimate = self.known_sizes.get(key)
+                    break
+            # Another thread is loading this model; use its result (or retry if it failed).
+            event.wait()
+
+        try:
+            if estimate is None:
+                estimate = checkpoint_bytes(key[0])
+            with self._lock:
+                self._make_room(estimate)
+                self._reserved[key] = estimate
+            model = self.loader(key[0], key[1], **load_kwargs)
+            size = self.size_fn(model)
+        except BaseException:
+            with self._lock:
+                self._reserved.pop(key, None)
+                self._loading.pop(key).set()
+            raise
+
+        with self._lock:
+            self._reserved.pop(key, None)
+            entry = _Entry(model, size)
+            self.known_sizes[key] = size
+            self.entries[key] = entry
+            self.loads += 1
+            model = self._checkout(key, entry, pin)
+            if self.budget_bytes is not None and self.resident_bytes() > self.budget_bytes:
+                self._make_room(0, keep=key)
+            self._loading.pop(key).set()
+        return model
+
+    def release(self, model_dir, profile="default"):
+        key = self.key(model_dir, profile)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+
+    @contextlib.contextmanager
+    def lease(self, model_dir, profile="default", **load_kwargs):
+        model = self.acquire(model_dir, profile, **load_kwargs)
+        try:
+            yield model
+        finally:
+            self.release(model_dir, profile)
+
+    def _make_room(self, incoming_bytes, keep=None):
+        if self.budget_bytes is None:
+            return
+        for key in list(self.entries):
+            if self.resident_bytes() + incoming_bytes <= self.budget_bytes:
+                return
+            entry = self.entries[key]
+            if key != keep and entry.refs == 0 and not entry.pinned:
+                self._evict(key)
+        if self.resident_bytes() + incoming_bytes > self.budget_bytes:
+            print(">> Model memory budget exceeded: {:.0f} MB resident + {:.0f} MB incoming > {:.0f} MB (models in use)".format(
+                self.resident_bytes() / 2 ** 20, incoming_bytes / 2 ** 20, self.budget_bytes / 2 ** 20))
+
+    def _evict(self, key):
+        entry = self.entries.pop(key)
+        print(">> Evicting model {} (profile {}, {:.0f} MB)".format(key[0], key[1], entry.bytes / 2 ** 20))
+        for callback in self.evict_callbacks:
+            callback(key, entry.model)
+        close = getattr(entry.model, "close", None)
+        if callable(close):
+            close()
+        entry.model = None
+        self.evictions += 1
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and hasattr(torch, "cuda") and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def evict(self, model_dir, profile="default"):
+        """Drop an idle model now; returns False if it is in use, pinned or not loaded."""
+        key = self.key(model_dir, profile)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.refs or entry.pinned:
+                return False
+            self._evict(key)
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "budget_mb": round(self.budget_bytes / 2 ** 20, 1) if self.budget_bytes is not None else None,
+                "resident_mb": round(self.resident_bytes() / 2 ** 20, 1),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "loading": ["{} ({})".format(*key) for key in self._loading],
+                "models": [
+                    {
+                        "model_dir": key[0],
+                        "profile": key[1],
+                        "mb": round(entry.bytes / 2 ** 20, 1),
+                        "refs": entry.refs,
+                        "pinned": entry.pinned,
+                    }
+                    for key, entry in self.entries.items()
+                ],
+            }
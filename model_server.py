@@ -0,0 +1,237 @@
+import os
+import sys
+import socket
+import struct
+import secrets
+import argparse
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Connection, answer_challenge, deliver_challenge
+
+from inference_profiles import add_profile_argument
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47861
+# Seconds a client may take to connect and authenticate, on either side; inference itself is not limited.
+HANDSHAKE_TIMEOUT_S = 5.0
+
+
+def server_address():
+    """(host, port) from TTS_SERVER=host:port, None when TTS_SERVER=off."""
+    value = os.environ.get("TTS_SERVER", "")
+    if value.lower() in ("off", "0", "no", "none"):
+        return None
+    if not value:
+        return (DEFAULT_HOST, DEFAULT_PORT)
+    host, _, port = value.rpartition(":")
+    return (host or DEFAULT_HOST, int(port))
+
+
+def server_keyfile():
+    return os.environ.get("TTS_SERVER_KEYFILE") or os.path.join(os.path.expanduser("~"), ".indextts", "server.key")
+
+
+def server_authkey(create=False):
+    """
+    Shared secret of the server and its clients: TTS_SERVER_AUTHKEY, or a random key in a
+    per-user 0600 file that the server creates on first start. None if there is neither.
+    """
+    value = os.environ.get("TTS_SERVER_AUTHKEY")
+    if value:
+        return value.encode("utf-8")
+    path = server_keyfile()
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        with open(path, "r") as f:
+            key = f.read().strip()
+    except OSError:
+        return None
+    return key.encode("utf-8") or None
+
+
+def _set_recv_timeout(conn, seconds):
+    """Kernel receive timeout on a socket Connection (0 = none), so a silent peer can't block forever."""
+    if sys.platform == "win32":
+        value = struct.pack("I", int(seconds * 1000))
+    else:
+        value = struct.pack("ll", int(seconds), int((seconds % 1) * 1e6))
+    sock = socket.socket(fileno=conn.fileno())
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, value)
+    finally:
+        sock.detach()
+
+
+class RemoteTTS:
+    """Stand-in for IndexTTS2 that forwards `infer` to a running model server."""
+
+    def __init__(self, conn, model_dir, address):
+        self._conn = conn
+        self._pending_seed = None
+        self.model_dir = model_dir
+        self.address = address
+
+    def _call(self, op, payload=None):
+        self._conn.send((op, payload))
+        status, result = self._conn.recv()
+        if status != "ok":
+            raise RuntimeError("model server: {}".format(result))
+        return result
+
+    def manual_seed(self, seed):
+        # Applied server-side under the inference lock, together with the next infer call.
+        self._pending_seed = seed
+
+    def infer(self, **kwargs):
+        seed, self._pending_seed = self._pending_seed, None
+        return self._call("infer", {"seed": seed, "kwargs": kwargs})
+
+    def close(self):
+        self._conn.close()
+
+
+def _served_profile(conn):
+    conn.send(("profile", None))
+    status, result = conn.recv()
+    # Servers that predate inference profiles answer with an error and run the default.
+    return result if status == "ok" else "default"
+
+
+def connect(model_dir, address=None, profile="default"):
+    """Client for a server that owns `model_dir` with `profile`, or None if none is reachable."""
+    address = address or server_address()
+    authkey = server_authkey()
+    if address is None or authkey is None:
+        return None
+    conn = None
+    try:
+        sock = socket.create_connection(address, timeout=HANDSHAKE_TIMEOUT_S)
+        sock.settimeout(None)
+        conn = Connection(sock.detach())
+        _set_recv_timeout(conn, HANDSHAKE_TIMEOUT_S)
+        # Mutual authentication: neither side unpickles anything from an unauthenticated peer.
+        answer_challenge(conn, authkey)
+        deliver_challenge(conn, authkey)
+        conn.send(("ping", None))
+        _, served_dir = conn.recv()
+        served_profile = _served_profile(conn)
+        _set_recv_timeout(conn, 0)
+    except (OSError, EOFError, AuthenticationError):
+        if conn is not None:
+            conn.close()
+        return None
+
+    if os.path.normcase(served_dir) != os.path.normcase(os.path.abspath(model_dir)):
+        print(">> Model server at {}:{} serves {}, loading in-process instead".format(address[0], address[1], served_dir))
+        conn.close()
+        return None
+    if served_profile != profile:
+        print(">> Model server at {}:{} runs profile {}, loading {} in-process instead".format(
+            address[0], address[1], served_profile, profile))
+        conn.close()
+        return None
+
+    print(">> Using model server at {}:{} ({}, profile {})".format(address[0], address[1], served_dir, served_profile))
+    return RemoteTTS(conn, served_dir, address)
+
+
+def _handle_client(conn, authkey, tts, model_dir, profile, lock, speaker_cache):
+    import torch
+
+    with conn:
+        try:
+            _set_recv_timeout(conn, HANDSHAKE_TIMEOUT_S)
+            deliver_challenge(conn, authkey)
+            answer_challenge(conn, authkey)
+            _set_recv_timeout(conn, 0)
+        except (OSError, EOFError, AuthenticationError) as e:
+            print("Warning: rejected connection:", e)
+            return
+        while True:
+            try:
+                op, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if op == "ping":
+                    result = model_dir
+                elif op == "profile":
+                    result = profile
+                elif op == "infer":
+                    kwargs = payload["kwargs"]
+                    prompt_wav = kwargs.get("spk_audio_prompt")
+                    with lock:
+                        if payload["seed"] is not None:
+                            torch.manual_seed(payload["seed"])
+                            if torch.cuda.is_available():
+                                torch.cuda.manual_seed_all(payload["seed"])
+                        speaker_cache.install(tts, prompt_wav)
+                        result = tts.infer(**kwargs)
+                        speaker_cache.capture(tts, prompt_wav)
+                else:
+                    raise ValueError("unknown op {!r}".format(op))
+                conn.send(("ok", result))
+            except Exception as e:
+                conn.send(("error", "{}: {}".format(type(e).__name__, e)))
+
+
+def serve(model_dir, address, persist_speaker_cond=False, profile="default"):
+    from simple_tts_v2 import get_model
+    from speaker_cache import SpeakerConditioningCache
+
+    model_dir = os.path.abspath(model_dir)
+    authkey = server_authkey(create=True)
+    if authkey is None:
+        raise OSError("could not create the server key file {}".format(server_keyfile()))
+    tts = get_model(model_dir, use_server=False, profile=profile)
+    lock = threading.Lock()
+    speaker_cache = SpeakerConditioningCache(persist=persist_speaker_cond)
+
+    # Authentication runs in each client's thread (with a timeout), so a stalled peer
+    # cannot block accept() for everyone else.
+    with Listener(address) as listener:
+        print(">> Model server listening on {}:{} ({}, profile {})".format(address[0], address[1], model_dir, profile))
+        while True:
+            try:
+                conn = listener.accept()
+            except KeyboardInterrupt:
+                break
+            except Exception as e:
+                print("Warning: rejected connection:", e)
+                continue
+            threading.Thread(
+                target=_handle_client,
+                args=(conn, authkey, tts, model_dir, profile, lock, speaker_cache),
+                daemon=True,
+            ).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep IndexTTS2 loaded for the TTS command line scripts")
+    parser.add_argument("--model_dir", type=str, required=True)
+    parser.add_argument("--host", type=str, default=None, help="Default from TTS_SERVER or 127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="Default from TTS_SERVER or {}".format(DEFAULT_PORT))
+    parser.add_argument("--persist_speaker_cond", action="store_true")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    host, port = server_address() or (DEFAULT_HOST, DEFAULT_PORT)
+    address = (args.host or host, args.port or port)
+    try:
+        serve(args.model_dir, address, persist_speaker_cond=args.persist_speaker_cond, profile=args.profile)
+    except OSError as e:
+        print("CRITICAL: could not start model server:", e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+
+import numpy as np
+
+import length_scheduler
+
+
+# Sampling used for retries, one entry per retry (the last one repeats). Greedy decoding
+# (stable_mode) is deterministic, so retrying it unchanged reproduces the same glitch;
+# retries sample instead, starting from IndexTTS2's own defaults and cooling down.
+RETRY_SAMPLING = (
+    {"do_sample": True, "top_p": 0.8, "top_k": 30, "temperature": 0.8, "repetition_penalty": 10.0},
+    {"do_sample": True, "top_p": 0.7, "top_k": 20, "temperature": 0.6, "repetition_penalty": 10.0},
+)
+
+# Output this close to the max_mel_tokens cap almost always means decoding never stopped.
+CAP_HIT_FRACTION = 0.98
+# ...as does audio far longer than the text can plausibly take.
+RUNAWAY_RATIO = 3.0
+RUNAWAY_SLACK_S = 3.0
+
+
+class RetryBudget:
+    """Retries shared by all jobs of one batch, so one bad batch can't multiply its latency."""
+
+    def __init__(self, retries):
+        self.remaining = max(0, int(retries))
+        self.used = 0
+
+    def take(self):
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        self.used += 1
+        return True
+
+
+class RetryPolicy:
+    """
+    Attempt plan for one sentence.
+
+    Attempt 1 uses the caller's kwargs and seed; later attempts switch to RETRY_SAMPLING
+    with a shifted seed. Output identical to an earlier failed attempt aborts (more
+    attempts would only repeat it), output that ran into max_mel_tokens (single-segment
+    text only) or far past the length estimate counts as a failure and tightens
+    max_mel_tokens for the next attempt, and every retry must be granted by the batch's
+    RetryBudget, if any.
+    """
+
+    def __init__(self, text, base_kwargs, max_retries=2, seed=None, budget=None):
+        self.text = text
+        self.base_kwargs = dict(base_kwargs)
+        self.attempts = max(1, int(max_retries) + 1)
+        self.seed = seed
+        self.budget = budget
+        self.max_mel_tokens = int(self.base_kwargs.get("max_mel_tokens") or length_scheduler.DEFAULT_MAX_MEL_TOKENS)
+        self._expected_s = length_scheduler.estimate_seconds(text)
+        # max_mel_tokens caps each of IndexTTS2's text segments, so the whole output can only
+        # be compared with it when the text is a single segment.
+        self._single_segment = length_scheduler.fits_one_segment(
+            text,
+            self.base_kwargs.get("max_text_tokens_per_segment") or length_scheduler.MAX_TEXT_TOKENS_PER_SEGMENT,
+        )
+        self._failed_outputs = set()
+
+    def plan(self, attempt):
+        """(infer kwargs, seed) for 1-based `attempt`."""
+        if attempt == 1:
+            return dict(self.base_kwargs), self.seed
+        kwargs = dict(self.base_kwargs)
+        kwargs.update(RETRY_SAMPLING[min(attempt - 2, len(RETRY_SAMPLING) - 1)])
+        kwargs["max_mel_tokens"] = self.max_mel_tokens
+        seed = None if self.seed is None else self.seed + attempt - 1
+        return kwargs, seed
+
+    def allow_retry(self):
+        return self.budget is None or self.budget.take()
+
+    def check_length(self, n_samples, sample_rate):
+        """Failure reason for runaway output (and tighten the cap), or None."""
+        duration_s = n_samples / float(sample_rate)
+        cap_s = self.max_mel_tokens / float(length_scheduler.MEL_TOKENS_PER_SECOND)
+        if self._single_segment and duration_s >= CAP_HIT_FRACTION * cap_s:
+            reason = "hit max_mel_tokens ({:.1f}s)".format(duration_s)
+        elif duration_s > self._expected_s * RUNAWAY_RATIO + RUNAWAY_SLACK_S:
+            reason = "runaway ({:.1f}s, expected ~{:.1f}s)".format(duration_s, self._expected_s)
+        else:
+            return None
+        self.max_mel_tokens = min(
+            self.max_mel_tokens,
+            length_scheduler.bucket_max_mel_tokens(self.text, ceiling=self.max_mel_tokens),
+        )
+        return reason
+
+    def is_repeat(self, samples):
+        """Record a failed output; True if an earlier attempt produced exactly the same audio."""
+        digest = hashlib.blake2b(np.ascontiguousarray(samples).tobytes(), digest_size=16).digest()
+        if digest in self._failed_outputs:
+            return True
+        self._failed_outputs.add(digest)
+        return False
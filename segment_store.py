@@ -0,0 +1,123 @@
+import os
+import json
+
+import numpy as np
+
+
+PCM_DTYPE = np.dtype("<i2")
+
+
+class SegmentStore:
+    """
+    Every synthesized segment of a run in one append-only 16-bit PCM file, `segments.pcm`,
+    plus `segments.idx.jsonl` with one line per segment: text hash (job_manifest.job_hash),
+    job id, offset, frames, channels, sample rate and status. Segments are keyed by the
+    hash alone, so any row range of the same deck finds them; the last line of a hash wins.
+
+    PCM is flushed before its index line, so after a crash the index never points past the
+    data. On resume, torn index lines and segments with incomplete PCM are dropped and both
+    files are cut back to the last complete segment, so later appends can't revive them.
+    Reads are zero-copy views into an np.memmap of the PCM file. Without `resume` the
+    store starts empty.
+    """
+
+    def __init__(self, directory, resume=False):
+        self.directory = directory
+        self.pcm_path = os.path.join(directory, "segments.pcm")
+        self.index_path = os.path.join(directory, "segments.idx.jsonl")
+        self.entries = {}
+        os.makedirs(directory, exist_ok=True)
+
+        if resume:
+            self._load_index()
+        mode = "ab" if resume else "wb"
+        self._pcm = open(self.pcm_path, mode)
+        self._index = open(self.index_path, mode)
+        self._map = None
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        size = os.path.getsize(self.pcm_path) if os.path.exists(self.pcm_path) else 0
+        kept = []
+        data_end = 0
+        rewrite = False
+        with open(self.index_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn last line of an interrupted run.
+                    rewrite = True
+                    continue
+                if entry.get("status") == "done":
+                    end = entry["offset"] + entry["frames"] * entry["channels"] * PCM_DTYPE.itemsize
+                    if end > size:
+                        rewrite = True
+                        continue
+                    data_end = max(data_end, end)
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                    rewrite = True
+                kept.append(line)
+                self.entries[entry["text_hash"]] = entry
+
+        if rewrite:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.writelines(kept)
+            os.replace(tmp_path, self.index_path)
+        if size > data_end:
+            with open(self.pcm_path, "r+b") as f:
+                f.truncate(data_end)
+
+    def __len__(self):
+        return sum(1 for entry in self.entries.values() if entry["status"] == "done")
+
+    def _append_index(self, entry):
+        self.entries[entry["text_hash"]] = entry
+        self._index.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._index.flush()
+
+    def put(self, text_hash, sample_rate, samples, job_id=None):
+        """Append one segment; returns it as (sample_rate, view into the store)."""
+        samples = np.asarray(samples, dtype=PCM_DTYPE)
+        channels = samples.shape[1] if samples.ndim > 1 else 1
+        self._pcm.seek(0, os.SEEK_END)
+        offset = self._pcm.tell()
+        self._pcm.write(np.ascontiguousarray(samples).tobytes())
+        self._pcm.flush()
+        self._append_index({
+            "job_id": job_id,
+            "text_hash": text_hash,
+            "offset": offset,
+            "frames": len(samples),
+            "channels": channels,
+            "sample_rate": int(sample_rate),
+            "status": "done",
+        })
+        return self.get(text_hash)
+
+    def record_failed(self, text_hash, job_id=None):
+        self._append_index({"job_id": job_id, "text_hash": text_hash, "status": "failed"})
+
+    def get(self, text_hash):
+        """(sample_rate, read-only (frames, channels) int16 view) of a done segment, or None."""
+        entry = self.entries.get(text_hash)
+        if not entry or entry["status"] != "done":
+            return None
+        start = entry["offset"] // PCM_DTYPE.itemsize
+        count = entry["frames"] * entry["channels"]
+        if count == 0:
+            return entry["sample_rate"], np.zeros((0, entry["channels"]), dtype=PCM_DTYPE)
+        if self._map is None or start + count > len(self._map):
+            # Remap once the file has grown past the current mapping. Map whole samples only:
+            # a torn write can leave the file an odd number of bytes long.
+            frames = os.path.getsize(self.pcm_path) // PCM_DTYPE.itemsize
+            self._map = np.memmap(self.pcm_path, dtype=PCM_DTYPE, mode="r", shape=(frames,))
+        return entry["sample_rate"], self._map[start:start + count].reshape(-1, entry["channels"])
+
+    def close(self):
+        self._map = None
+        self._pcm.close()
+        self._index.close()
@@ -1,5 +1,6 @@
 ﻿import os
 import sys
+import time
 import wave
 
 # Keep cache/offline behavior aligned with existing script
@@ -14,44 +15,96 @@ if index_tts_root not in sys.path:
     sys.path.append(os.path.join(index_tts_root, "indextts"))
 
 import argparse
+from collections import namedtuple
+import length_scheduler
+from audio_quality import analyze_samples
+from instrumentation import NULL_TRACER
+from retry_policy import RetryPolicy, RetryBudget
+from inference_profiles import get_profile, add_profile_argument, configure_threads, mmap_checkpoints, optimize_model, warm_up
+from model_registry import ModelRegistry, budget_from_env
 import numpy as np
-import torch
 
-try:
-    from transformers import PreTrainedModel
-
-    _orig_from_pretrained = PreTrainedModel.from_pretrained
-
-    @classmethod
-    def patched_from_pretrained(cls, pretrained_model_name_or_path, *model_args, **kwargs):
-        kwargs['local_files_only'] = True
-        kwargs.setdefault('low_cpu_mem_usage', True)
-        return _orig_from_pretrained.__func__(cls, pretrained_model_name_or_path, *model_args, **kwargs)
-
-    PreTrainedModel.from_pretrained = patched_from_pretrained
-except Exception:
-    pass
+# torch/transformers/indextts are imported on first use so that `--help`, argument errors
+# and model-server clients start instantly.
+_transformers_patched = False
+
+TTSJob = namedtuple("TTSJob", ["prompt_wav", "text", "output_path"])
+
+
+def _patch_transformers():
+    global _transformers_patched
+    if _transformers_patched:
+        return
+    _transformers_patched = True
+    try:
+        from transformers import PreTrainedModel
+
+        _orig_from_pretrained = PreTrainedModel.from_pretrained
+
+        @classmethod
+        def patched_from_pretrained(cls, pretrained_model_name_or_path, *model_args, **kwargs):
+            kwargs['local_files_only'] = True
+            kwargs.setdefault('low_cpu_mem_usage', True)
+            return _orig_from_pretrained.__func__(cls, pretrained_model_name_or_path, *model_args, **kwargs)
+
+        PreTrainedModel.from_pretrained = patched_from_pretrained
+    except Exception:
+        pass
+
+
+def _load_model(model_dir, profile, use_server=True, threads=None):
+    """
+    Load IndexTTS2 from `model_dir` with inference profile `profile`. When a model_server
+    for the same model_dir and profile is running, a thin client to it is returned instead.
+    """
+    profile = get_profile(profile)
+    if use_server:
+        import model_server
+
+        client = model_server.connect(model_dir, profile=profile.name)
+        if client is not None:
+            return client
+
+    import torch
+
+    _patch_transformers()
+    configure_threads(profile, threads)
+    cfg_path = os.path.join(model_dir, "config.yaml")
+    from indextts.infer_v2 import IndexTTS2
+
+    print(f">> Loading IndexTTS2 model from {model_dir} (profile {profile.name})...")
+    kwargs = {"use_fp16": torch.cuda.is_available()}
+    if profile.device is not None:
+        kwargs = {"use_fp16": False, "device": profile.device}
+    with mmap_checkpoints(profile.mmap_load):
+        tts = IndexTTS2(model_dir=model_dir, cfg_path=cfg_path, **kwargs)
+    for step in optimize_model(tts, profile):
+        print(f">> Profile {profile.name}: {step}")
+    if profile.warmup:
+        # The model is loaded; a failed warm-up only means the first row pays the lazy init.
+        try:
+            print(f">> Warm-up took {warm_up(tts):.2f}s")
+        except Exception as e:
+            print(f"Warning: warm-up failed for profile {profile.name}: {e}")
+    return tts
 
-_model_instance = None
 
+# Process-wide models by (model_dir, profile); TTS_MODEL_BUDGET_MB caps their memory.
+registry = ModelRegistry(_load_model, budget_bytes=budget_from_env())
 
-def get_model(model_dir):
-    global _model_instance
-    if _model_instance is None:
-        model_dir = os.path.abspath(model_dir)
-        cfg_path = os.path.join(model_dir, "config.yaml")
-        from indextts.infer_v2 import IndexTTS2
 
-        print(f">> Loading IndexTTS2 model from {model_dir}...")
-        _model_instance = IndexTTS2(
-            model_dir=model_dir,
-            cfg_path=cfg_path,
-            use_fp16=torch.cuda.is_available(),
-        )
-    return _model_instance
+def get_model(model_dir, use_server=True, profile="default", threads=None):
+    """
+    The model for `model_dir` and `profile` (an inference_profiles.PROFILES name), loaded on
+    first use and pinned for the life of the process. `threads` overrides the profile's
+    torch thread count. Code that switches between models should use `registry.lease()`
+    instead, so idle models can be evicted under the memory budget.
+    """
+    get_profile(profile)
+    return registry.acquire(model_dir, profile, pin=True, use_server=use_server, threads=threads)
 
 
-def _build_infer_kwargs(stable_mode=True):
+def _build_infer_kwargs(stable_mode=True, max_mel_tokens=1024):
     if stable_mode:
         return {
             "do_sample": False,
@@ -61,7 +114,7 @@ def _build_infer_kwargs(stable_mode=True):
             "length_penalty": 1.0,
             "num_beams": 1,
             "repetition_penalty": 1.0,
-            "max_mel_tokens": 1024,
+            "max_mel_tokens": max_mel_tokens,
         }
 
     return {
@@ -72,7 +125,7 @@ def _build_infer_kwargs(stable_mode=True):
         "length_penalty": 1.0,
         "num_beams": 1,
         "repetition_penalty": 1.0,
-        "max_mel_tokens": 1024,
+        "max_mel_tokens": max_mel_tokens,
     }
 
 
@@ -93,32 +146,22 @@ def _load_mono_float(path):
     return samples, frame_rate
 
 
-def _has_obvious_glitch(wav_path):
-    samples, sr = _load_mono_float(wav_path)
-    if samples is None or sr is None or len(samples) == 0:
-        return True
-
-    if len(samples) < int(0.12 * sr):
-        return True
+def _apply_seed(tts, seed):
+    if hasattr(tts, "manual_seed"):
+        tts.manual_seed(seed)
+        return
+    import torch
 
-    peak = float(np.max(np.abs(samples)))
-    if peak < 1e-4:
-        return True
-
-    clip_ratio = float(np.mean(np.abs(samples) >= 0.999))
-    if clip_ratio > 0.02:
-        return True
+    torch.manual_seed(seed)
+    if torch.cuda.is_available():
+        torch.cuda.manual_seed_all(seed)
 
-    d = np.abs(np.diff(samples))
-    if len(d) < 100:
-        return False
 
-    p999 = float(np.percentile(d, 99.9))
-    med = float(np.median(d)) + 1e-9
-    if p999 > 0.45 and (p999 / med) > 120.0:
+def _has_obvious_glitch(wav_path):
+    samples, sr = _load_mono_float(wav_path)
+    if samples is None or sr is None:
         return True
-
-    return False
+    return not analyze_samples(samples, sr).ok
 
 
 def run_tts_with_model(
@@ -131,44 +174,179 @@ def run_tts_with_model(
     max_retries=2,
     seed=None,
     quality_check=True,
+    cache=None,
+    speaker_cache=None,
+    max_mel_tokens=None,
+    tracer=None,
+    retry_budget=None,
 ):
+    """
+    Synthesize `text` with retries and an optional quality check.
+
+    Returns the written path, or `(sample_rate, samples)` when `output_path` is None
+    (IndexTTS2's own in-memory convention); None if every attempt failed.
+    Retries follow retry_policy.RetryPolicy: they vary seed/sampling, stop early on a
+    repeated output, tighten max_mel_tokens after runaway decodes and draw from the
+    batch's `retry_budget` (retry_policy.RetryBudget) when given.
+    `tracer` (instrumentation.Tracer) receives stage timings, retry counts and a
+    "synth" trace event per call.
+    """
+    tracer = tracer or NULL_TRACER
+    in_memory = output_path is None
     prompt_wav = os.path.abspath(prompt_wav)
-    output_path = os.path.abspath(output_path)
-
-    if seed is not None:
-        torch.manual_seed(seed)
-        if torch.cuda.is_available():
-            torch.cuda.manual_seed_all(seed)
+    if not in_memory:
+        output_path = os.path.abspath(output_path)
 
     kwargs = _build_infer_kwargs(stable_mode=stable_mode)
-    attempts = max(1, int(max_retries) + 1)
+    if max_mel_tokens:
+        kwargs["max_mel_tokens"] = int(max_mel_tokens)
+
+    cache_key = None
+    if cache is not None:
+        with tracer.stage("cache_lookup"):
+            cache_key = cache.make_key(text, prompt_wav, kwargs, seed)
+            cached = cache.fetch_audio(cache_key) if in_memory else cache.fetch(cache_key, output_path)
+        if cached:
+            tracer.count("cache_hits")
+            return cached
+
+    policy = RetryPolicy(text, kwargs, max_retries=max_retries, seed=seed, budget=retry_budget)
+    attempts = policy.attempts
+    started = time.perf_counter()
 
     for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            if not policy.allow_retry():
+                tracer.count("budget_exhausted")
+                print("Retry budget for this batch is used up, giving up on this sentence")
+                break
+            tracer.count("retries")
+        attempt_kwargs, attempt_seed = policy.plan(attempt)
+        if attempt_seed is not None:
+            _apply_seed(tts, attempt_seed)
         try:
-            result_path = tts.infer(
-                spk_audio_prompt=prompt_wav,
-                text=text,
-                output_path=output_path,
-                verbose=True,
-                **kwargs,
-            )
-
-            if not result_path or not os.path.exists(result_path):
-                raise RuntimeError("TTS returned empty output path")
-
-            if quality_check and _has_obvious_glitch(result_path):
-                print(f"Inference quality check failed on attempt {attempt}/{attempts}, retrying...")
+            with tracer.stage("infer"):
+                if speaker_cache is not None:
+                    speaker_cache.install(tts, prompt_wav)
+
+                result = tts.infer(
+                    spk_audio_prompt=prompt_wav,
+                    text=text,
+                    output_path=output_path,
+                    verbose=True,
+                    **attempt_kwargs,
+                )
+
+                if speaker_cache is not None:
+                    speaker_cache.capture(tts, prompt_wav)
+
+            with tracer.stage("quality_check"):
+                if in_memory:
+                    if not result or len(result) != 2:
+                        raise RuntimeError("TTS returned no audio")
+                    sample_rate, samples = int(result[0]), np.asarray(result[1])
+                    audio_s = len(samples) / float(sample_rate)
+                    checked = samples
+                else:
+                    if not result or not os.path.exists(result):
+                        raise RuntimeError("TTS returned empty output path")
+                    audio_s = None
+                    checked, sample_rate = _load_mono_float(result) if quality_check else (None, None)
+
+                failure = None
+                if quality_check:
+                    if checked is None:
+                        failure = "unreadable output"
+                    else:
+                        failure = policy.check_length(len(checked), sample_rate)
+                        if failure:
+                            tracer.count("runaways")
+                        elif not analyze_samples(checked, sample_rate).ok:
+                            failure = "quality check failed"
+                            tracer.count("quality_failures")
+
+            if failure:
+                if checked is not None and policy.is_repeat(checked):
+                    tracer.count("repeat_aborts")
+                    print(f"Attempt {attempt}/{attempts} repeated an earlier failed output ({failure}), giving up")
+                    break
+                print(f"Inference {failure} on attempt {attempt}/{attempts}, retrying...")
                 continue
 
-            return result_path
+            if cache is not None:
+                try:
+                    with tracer.stage("cache_store"):
+                        if in_memory:
+                            cache.store_audio(cache_key, sample_rate, samples)
+                        else:
+                            cache.store(cache_key, result)
+                except OSError as e:
+                    print(f"Warning: could not store synthesis cache entry: {e}")
+
+            wall_s = time.perf_counter() - started
+            tracer.event(
+                "synth",
+                chars=len(text),
+                attempts=attempt,
+                audio_s=round(audio_s, 3) if audio_s is not None else None,
+                wall_s=round(wall_s, 6),
+                rtf=round(audio_s / wall_s, 3) if audio_s and wall_s > 0 else None,
+            )
+            return (sample_rate, samples) if in_memory else result
         except Exception as e:
+            tracer.count("infer_errors")
             print(f"Inference failed on attempt {attempt}/{attempts}: {e}")
 
+    tracer.count("failed_jobs")
+    tracer.event("synth", chars=len(text), attempts=attempt, failed=True,
+                 wall_s=round(time.perf_counter() - started, 6))
     return None
 
 
-def run_tts(model_dir, prompt_wav, text, output_path):
-    tts = get_model(model_dir)
+def run_tts_batch(tts, items, batch_size=8, length_buckets=False, retries_per_batch=None, **run_kwargs):
+    """
+    Synthesize many (prompt_wav, text, output_path) items; returns one result per item, in input order.
+
+    IndexTTS2 has no multi-sentence forward pass and keeps the conditioning of only the
+    last prompt, so each window of `batch_size` items is regrouped by prompt (in order of
+    first appearance) to avoid re-encoding prompts between neighbouring items.
+    With `length_buckets`, items in a window also run shortest first, each capped at the
+    max_mel_tokens bucket of its estimated length (see length_scheduler).
+    Retries and quality checks are applied per item by run_tts_with_model; with
+    `retries_per_batch`, all items of a window share that many retries.
+    """
+    items = [TTSJob(*item) for item in items]
+    results = [None] * len(items)
+    batch_size = max(1, int(batch_size))
+
+    for start in range(0, len(items), batch_size):
+        window = [
+            (os.path.abspath(item.prompt_wav), item.text)
+            for item in items[start:start + batch_size]
+        ]
+        if length_buckets:
+            order, mel_caps = length_scheduler.schedule(window)
+        else:
+            order, mel_caps = length_scheduler.group_by_prompt(window), [None] * len(window)
+        budget = RetryBudget(retries_per_batch) if retries_per_batch is not None else None
+
+        for j in order:
+            i = start + j
+            results[i] = run_tts_with_model(
+                tts,
+                window[j][0],
+                items[i].text,
+                items[i].output_path,
+                max_mel_tokens=mel_caps[j],
+                retry_budget=budget,
+                **run_kwargs,
+            )
+
+    return results
+
+
+def run_tts(model_dir, prompt_wav, text, output_path, profile="default"):
+    tts = get_model(model_dir, profile=profile)
     return run_tts_with_model(tts, prompt_wav, text, output_path)
 
 
@@ -182,9 +360,16 @@ if __name__ == "__main__":
     parser.add_argument("--max_retries", type=int, default=2)
     parser.add_argument("--seed", type=int, default=None)
     parser.add_argument("--no_quality_check", action="store_true")
+    parser.add_argument("--persist_speaker_cond", action="store_true", help="Reuse/save <prompt>.spk.npz")
+    add_profile_argument(parser)
     args = parser.parse_args()
 
-    tts_model = get_model(args.model_dir)
+    tts_model = get_model(args.model_dir, profile=args.profile)
+    spk_cache = None
+    if args.persist_speaker_cond:
+        from speaker_cache import SpeakerConditioningCache
+
+        spk_cache = SpeakerConditioningCache(persist=True)
     run_tts_with_model(
         tts_model,
         args.prompt_wav,
@@ -194,4 +379,5 @@ if __name__ == "__main__":
         max_retries=args.max_retries,
         seed=args.seed,
         quality_check=not args.no_quality_check,
+        speaker_cache=spk_cache,
     )
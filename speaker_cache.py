@@ -0,0 +1,160 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from synthesis_cache import file_content_hash, model_fingerprint
+
+
+# IndexTTS2 keeps the conditioning of the *last* prompt in these attributes and recomputes
+# everything (decode, resample, w2v-bert, semantic codec, campplus, mel) whenever the prompt
+# changes, so alternating --en_prompt/--zh_prompt re-encodes both prompts on every row.
+_TENSOR_ATTRS = (
+    "cache_spk_cond",
+    "cache_s2mel_style",
+    "cache_s2mel_prompt",
+    "cache_mel",
+    "cache_emo_cond",
+)
+_PROMPT_ATTRS = ("cache_spk_audio_prompt", "cache_emo_audio_prompt")
+
+_NPZ_SUFFIX = ".spk.npz"
+
+
+def _supports(tts):
+    return all(hasattr(tts, name) for name in _TENSOR_ATTRS + _PROMPT_ATTRS)
+
+
+class SpeakerConditioningCache:
+    """
+    Keyed store of per-prompt speaker conditioning for IndexTTS2.
+
+    `install()` swaps a stored entry into the model's single-slot cache before `infer`,
+    `capture()` records the slot after `infer` computed it. With `persist=True` entries are
+    also saved next to the prompt as `<prompt>.spk.npz` and reused by later runs.
+    """
+
+    def __init__(self, max_entries=8, persist=False):
+        self.max_entries = max(1, int(max_entries))
+        self.persist = persist
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._model_fps = {}
+
+    def _model_fp(self, tts):
+        model_dir = getattr(tts, "model_dir", None)
+        if not model_dir:
+            return None
+        if model_dir not in self._model_fps:
+            self._model_fps[model_dir] = model_fingerprint(model_dir)
+        return self._model_fps[model_dir]
+
+    @staticmethod
+    def _key(tts, prompt_hash):
+        # Conditioning depends on the checkpoint, so models sharing this cache never mix entries.
+        return (getattr(tts, "model_dir", None), prompt_hash)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def forget_model(self, model_dir):
+        """Drop the in-memory conditioning computed by the model loaded from `model_dir`."""
+        for key in [key for key in self._entries if key[0] == model_dir]:
+            del self._entries[key]
+
+    def prepare(self, tts, prompt_wav):
+        """Load the conditioning for `prompt_wav` from memory or disk; True if it is available."""
+        if not _supports(tts):
+            return False
+        prompt_wav = os.path.abspath(prompt_wav)
+        prompt_hash = file_content_hash(prompt_wav)
+        key = self._key(tts, prompt_hash)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return True
+        if self.persist:
+            entry = self._load_npz(tts, prompt_wav, prompt_hash)
+            if entry is not None:
+                self._remember(key, entry)
+                return True
+        return False
+
+    def install(self, tts, prompt_wav):
+        if not _supports(tts):
+            return False
+        prompt_wav = os.path.abspath(prompt_wav)
+        if tts.cache_spk_audio_prompt == prompt_wav and tts.cache_emo_audio_prompt == prompt_wav:
+            self.hits += 1
+            return True
+        if not self.prepare(tts, prompt_wav):
+            self.misses += 1
+            return False
+
+        entry = self._entries[self._key(tts, file_content_hash(prompt_wav))]
+        for name in _TENSOR_ATTRS:
+            setattr(tts, name, entry[name])
+        for name in _PROMPT_ATTRS:
+            setattr(tts, name, prompt_wav)
+        self.hits += 1
+        return True
+
+    def capture(self, tts, prompt_wav):
+        if not _supports(tts):
+            return
+        prompt_wav = os.path.abspath(prompt_wav)
+        if tts.cache_spk_audio_prompt != prompt_wav or tts.cache_emo_audio_prompt != prompt_wav:
+            return
+        prompt_hash = file_content_hash(prompt_wav)
+        key = self._key(tts, prompt_hash)
+        if key in self._entries:
+            return
+        entry = {name: getattr(tts, name) for name in _TENSOR_ATTRS}
+        if any(value is None for value in entry.values()):
+            return
+
+        self._remember(key, entry)
+        if self.persist:
+            try:
+                self._save_npz(tts, prompt_wav, prompt_hash, entry)
+            except OSError as e:
+                print("Warning: could not persist speaker conditioning for {}: {}".format(prompt_wav, e))
+
+    def _save_npz(self, tts, prompt_wav, key, entry):
+        arrays = {"prompt_hash": np.array(key), "model_fp": np.array(self._model_fp(tts) or "")}
+        for name, tensor in entry.items():
+            tensor = tensor.detach().cpu()
+            dtype_name = str(tensor.dtype).replace("torch.", "")
+            if dtype_name == "bfloat16":
+                # NumPy has no bfloat16; the original dtype is restored on load.
+                tensor = tensor.float()
+            arrays[name + "__dtype"] = np.array(dtype_name)
+            arrays[name] = tensor.numpy()
+
+        path = prompt_wav + _NPZ_SUFFIX
+        tmp = "{}.{}.tmp.npz".format(path, os.getpid())
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    def _load_npz(self, tts, prompt_wav, key):
+        path = prompt_wav + _NPZ_SUFFIX
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if str(data["prompt_hash"]) != key or str(data["model_fp"]) != (self._model_fp(tts) or ""):
+                    return None
+                import torch
+
+                device = getattr(tts, "device", "cpu")
+                entry = {}
+                for name in _TENSOR_ATTRS:
+                    dtype = getattr(torch, str(data[name + "__dtype"]))
+                    entry[name] = torch.from_numpy(data[name]).to(device=device, dtype=dtype)
+                return entry
+        except (OSError, KeyError, ValueError) as e:
+            print("Warning: ignoring unreadable speaker conditioning {}: {}".format(path, e))
+            return None
@@ -0,0 +1,205 @@
+import queue
+import struct
+import threading
+import subprocess
+
+
+_RIFF_LIMIT = 0xFFFFFFFF
+
+
+def format_srt_time(ms):
+    s, ms = divmod(int(round(ms)), 1000)
+    m, s = divmod(s, 60)
+    h, m = divmod(m, 60)
+    return "{:02d}:{:02d}:{:02d},{:03d}".format(h, m, s, ms)
+
+
+def wav_header(frame_rate, channels, sample_width, data_bytes):
+    """44-byte PCM WAV header; sizes past the 4 GB RIFF limit are clamped."""
+    block_align = channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        min(36 + data_bytes, _RIFF_LIMIT),
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        channels,
+        frame_rate,
+        frame_rate * block_align,
+        block_align,
+        sample_width * 8,
+        b"data",
+        min(data_bytes, _RIFF_LIMIT),
+    )
+
+
+class StreamingWavWriter:
+    """
+    PCM WAV writer that appends frames as they arrive.
+
+    The header is written up front and its RIFF/data sizes are patched on every
+    flush(), so a run that dies midway still leaves a playable file.
+    """
+
+    def __init__(self, path, frame_rate, channels, sample_width):
+        self.path = path
+        self.frame_rate = int(frame_rate)
+        self.channels = int(channels)
+        self.sample_width = int(sample_width)
+        self.data_bytes = 0
+        self._patched_bytes = None
+        self._f = open(path, "wb")
+        self._f.write(self._header(0))
+
+    def _header(self, data_bytes):
+        return wav_header(self.frame_rate, self.channels, self.sample_width, data_bytes)
+
+    def write_frames(self, data):
+        self._f.write(data)
+        self.data_bytes += len(data)
+
+    def flush(self):
+        if self._patched_bytes != self.data_bytes:
+            end = self._f.tell()
+            self._f.seek(0)
+            self._f.write(self._header(self.data_bytes))
+            self._f.seek(end)
+            self._patched_bytes = self.data_bytes
+        self._f.flush()
+
+    def close(self):
+        if self._f.closed:
+            return
+        if self.data_bytes % 2:
+            # RIFF chunks are word aligned; the pad byte is not part of the data size.
+            self._f.write(b"\x00")
+        self.flush()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ffmpeg settings per --output_format: (encoder, default bitrate, extra output options).
+ENCODERS = {
+    "mp3": ("libmp3lame", "128k", ()),
+    "opus": ("libopus", "64k", ("-f", "ogg")),
+}
+_PCM_FORMATS = {1: "u8", 2: "s16le", 4: "s32le"}
+
+
+class EncoderPipeWriter:
+    """
+    Same interface as StreamingWavWriter, but PCM goes to a long-running ffmpeg process
+    that encodes to mp3/opus as frames arrive. A feeder thread drains a bounded queue into
+    ffmpeg's stdin, so encoding overlaps with synthesis and no intermediate WAV is written.
+    """
+
+    def __init__(self, path, frame_rate, channels, sample_width, output_format, bitrate=None,
+                 ffmpeg="ffmpeg", max_pending=64):
+        codec, default_bitrate, extra = ENCODERS[output_format]
+        self.path = path
+        self.frame_rate = int(frame_rate)
+        self.channels = int(channels)
+        self.sample_width = int(sample_width)
+        self.data_bytes = 0
+        self.error = None
+        cmd = [
+            ffmpeg, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+            "-f", _PCM_FORMATS[self.sample_width], "-ar", str(self.frame_rate), "-ac", str(self.channels),
+            "-i", "pipe:0",
+            "-c:a", codec, "-b:a", bitrate or default_bitrate,
+        ]
+        cmd.extend(extra)
+        cmd.append(path)
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        self._stdin = self._proc.stdin
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._feeder = threading.Thread(target=self._feed, name="encoder-feeder", daemon=True)
+        self._feeder.start()
+
+    def _feed(self):
+        while True:
+            chunk = self._pending.get()
+            if chunk is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self._stdin.write(chunk)
+            except (OSError, ValueError) as e:
+                self.error = e
+        try:
+            self._stdin.close()
+        except OSError:
+            pass
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError("encoder for {} failed: {}".format(self.path, self.error))
+
+    def write_frames(self, data):
+        self._check()
+        # Copy: callers may hand in views of buffers they reuse.
+        self._pending.put(bytes(data))
+        self.data_bytes += len(data)
+
+    def flush(self):
+        self._check()
+
+    def close(self):
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        self._pending.put(None)
+        self._feeder.join()
+        code = proc.wait()
+        if code != 0 and self.error is None:
+            self.error = "ffmpeg exited with status {}".format(code)
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SrtWriter:
+    """Writes numbered SRT entries as soon as they are known. The file is created on the first entry."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._f = None
+
+    def write(self, start_ms, end_ms, text):
+        if self._f is None:
+            self._f = open(self.path, "w", encoding="utf-8")
+        else:
+            self._f.write("\n")
+        self.count += 1
+        self._f.write(
+            "{}\n{} --> {}\n{}\n".format(
+                self.count,
+                format_srt_time(start_ms),
+                format_srt_time(end_ms),
+                text,
+            )
+        )
+        self._f.flush()
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
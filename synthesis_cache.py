@@ -0,0 +1,168 @@
+import os
+import json
+import shutil
+import hashlib
+import unicodedata
+
+from wav_io import read_wav, write_wav
+
+
+_content_hash_memo = {}
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+
+def file_content_hash(path):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+    digest = _content_hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        _content_hash_memo[memo_key] = digest
+    return digest
+
+
+def model_fingerprint(model_dir):
+    # Name/size/mtime of every checkpoint file; hashing GBs of weights per run is not worth it.
+    model_dir = os.path.abspath(model_dir)
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(model_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            rel = os.path.relpath(path, model_dir).replace(os.sep, "/")
+            h.update("{}\0{}\0{}\n".format(rel, st.st_size, st.st_mtime_ns).encode("utf-8"))
+    return h.hexdigest()
+
+
+class SynthesisCache:
+    """
+    On-disk cache of synthesized WAVs keyed by (text, prompt audio, decode kwargs, seed, model,
+    inference profile).
+
+    Entries are plain files, and the file mtime is the LRU clock, so several processes
+    can share one cache directory without a shared index.
+    """
+
+    def __init__(self, cache_dir, model_dir, max_bytes=2 * 1024 ** 3, profile="default"):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.model_fp = model_fingerprint(model_dir)
+        # Profiles change the audio (int8 GPT, bf16 vocoder), so their outputs never mix.
+        self.profile = profile
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = None
+        self._total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, text, prompt_wav, infer_kwargs, seed):
+        payload = {
+            "text": normalize_text(text),
+            "prompt": file_content_hash(prompt_wav),
+            "kwargs": infer_kwargs,
+            "seed": seed,
+            "model": self.model_fp,
+            "profile": self.profile,
+        }
+        blob = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(blob).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".wav")
+
+    def fetch(self, key, output_path):
+        src = self._entry_path(key)
+        try:
+            os.utime(src)
+        except OSError:
+            self.misses += 1
+            return None
+
+        output_path = os.path.abspath(output_path)
+        if output_path != src:
+            shutil.copyfile(src, output_path)
+        self.hits += 1
+        return output_path
+
+    def fetch_audio(self, key):
+        src = self._entry_path(key)
+        try:
+            os.utime(src)
+            audio = read_wav(src)
+        except (OSError, ValueError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return audio
+
+    def store(self, key, wav_path):
+        self._commit(key, lambda tmp: shutil.copyfile(wav_path, tmp))
+
+    def store_audio(self, key, sample_rate, samples):
+        self._commit(key, lambda tmp: write_wav(tmp, sample_rate, samples))
+
+    def _commit(self, key, write):
+        dst = self._entry_path(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = "{}.{}.tmp".format(dst, os.getpid())
+        write(tmp)
+        os.replace(tmp, dst)
+
+        entries = self._scan()
+        size = os.path.getsize(dst)
+        self._total_bytes += size - entries.get(dst, 0)
+        entries[dst] = size
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _scan(self):
+        if self._entries is None:
+            self._entries = {}
+            self._total_bytes = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".wav"):
+                        path = os.path.join(root, name)
+                        size = os.path.getsize(path)
+                        self._entries[path] = size
+                        self._total_bytes += size
+        return self._entries
+
+    def _evict(self):
+        # Trim to 90% of the budget so a full cache does not evict on every store.
+        budget = int(self.max_bytes * 0.9)
+        by_age = []
+        for path in list(self._entries):
+            try:
+                by_age.append((os.path.getmtime(path), path))
+            except OSError:
+                self._total_bytes -= self._entries.pop(path)
+        by_age.sort()
+
+        for _, path in by_age:
+            if self._total_bytes <= budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._total_bytes -= self._entries.pop(path)
+            self.evictions += 1
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = (100.0 * self.hits / lookups) if lookups else 0.0
+        return "Synthesis cache: {} hits, {} misses ({:.1f}% hit rate), {} evicted".format(
+            self.hits, self.misses, rate, self.evictions
+        )
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from audio_normalize import from_float, normalize, resample
+
+
+RATE_PAIRS = [(44100, 22050), (22050, 24000), (24000, 16000), (16000, 48000), (48000, 44100)]
+
+
+def _sine(freq, rate, n, phase=0.0):
+    return 0.5 * np.sin(2 * np.pi * freq * np.arange(n) / rate + phase)
+
+
+@pytest.mark.parametrize("src_rate,dst_rate", RATE_PAIRS)
+@pytest.mark.parametrize("freq", [440.0, 1000.0, 3000.0])
+def test_resample_matches_analytic_sine(src_rate, dst_rate, freq):
+    n = src_rate
+    x = _sine(freq, src_rate, n).astype(np.float32)[:, None]
+    y = resample(x, src_rate, dst_rate)
+
+    assert y.dtype == np.float32
+    assert y.shape == (-(-n * dst_rate // src_rate), 1)
+    # Away from the zero-padded edges the output is the same sine sampled at dst_rate.
+    edge = dst_rate // 20
+    expected = _sine(freq, dst_rate, len(y))
+    assert np.abs(y[edge:-edge, 0] - expected[edge:-edge]).max() < 5e-5
+
+
+def test_resample_keeps_channels_apart():
+    x = np.stack([_sine(440.0, 24000, 12000), _sine(1000.0, 24000, 12000, phase=1.0)], axis=1).astype(np.float32)
+    y = resample(x, 24000, 22050)
+
+    assert y.shape == (11025, 2)
+    for channel, (freq, phase) in enumerate([(440.0, 0.0), (1000.0, 1.0)]):
+        expected = _sine(freq, 22050, len(y), phase)
+        assert np.abs(y[1000:-1000, channel] - expected[1000:-1000]).max() < 5e-5
+
+
+def test_resample_passthrough():
+    x = np.ones((10, 1), dtype=np.float32)
+    assert resample(x, 22050, 22050) is x
+    empty = np.zeros((0, 1), dtype=np.float32)
+    assert resample(empty, 22050, 44100) is empty
+
+
+def test_from_float_clips_int32_without_wrapping():
+    out = from_float(np.array([[1.2], [-1.5], [0.5]], dtype=np.float32), np.int32)
+    assert out.dtype == np.int32
+    assert out[0, 0] > 2 ** 31 - 256
+    assert out[1, 0] == -2 ** 31
+    assert out[2, 0] == 2 ** 30
+
+
+def test_normalize_full_scale_square_to_width_4():
+    square = np.where(np.arange(22050) // 25 % 2, 32767, -32768).astype(np.int16)
+    out = normalize(square, 22050, 44100, 1, 4)
+
+    assert out.dtype == np.int32
+    assert len(out) == 44100
+    # Overshoot past full scale clips at the rails; a sample wrapped to the opposite rail
+    # would show up as a jump of nearly 2**32 between neighbours.
+    assert np.abs(np.diff(out[:, 0].astype(np.int64))).max() < 2 ** 31
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+
+import benchmark
+import csv_batch_tts_v2
+from segment_store import PCM_DTYPE, SegmentStore
+
+
+def _tone(frames, channels=1, value=1):
+    return np.arange(frames * channels, dtype=PCM_DTYPE).reshape(frames, channels) + value
+
+
+def test_put_get_keyed_by_text_hash(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.put("h1", 22050, _tone(100), job_id="row_0001_en")
+    store.put("h2", 22050, _tone(50, channels=2), job_id="row_0002_en")
+    store.close()
+
+    store = SegmentStore(str(tmp_path), resume=True)
+    sample_rate, samples = store.get("h1")
+    assert sample_rate == 22050
+    np.testing.assert_array_equal(samples, _tone(100))
+    assert store.get("h2")[1].shape == (50, 2)
+    # A different row range gives the same text another job id; the hash still finds it.
+    assert store.get("row_0001_en") is None
+    store.close()
+
+
+def test_resume_skips_torn_index_line_and_truncated_pcm(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.put("kept", 16000, _tone(40))
+    store.put("cut", 16000, _tone(40))
+    store.close()
+
+    # Crash mid-append: the second segment's PCM is cut short on an odd byte and the
+    # index ends in half a line.
+    with open(store.pcm_path, "r+b") as f:
+        f.truncate(os.path.getsize(store.pcm_path) - 11)
+    with open(store.index_path, "ab") as f:
+        f.write(b'{"text_hash": "torn", "off')
+
+    store = SegmentStore(str(tmp_path), resume=True)
+    assert len(store) == 1
+    assert store.get("cut") is None
+    np.testing.assert_array_equal(store.get("kept")[1], _tone(40))
+    # The torn tail is cut off, so new segments start right after the last complete one...
+    assert os.path.getsize(store.pcm_path) == 40 * PCM_DTYPE.itemsize
+
+    store.put("new", 16000, _tone(30, value=7))
+    assert store.entries["new"]["offset"] == 40 * PCM_DTYPE.itemsize
+    np.testing.assert_array_equal(store.get("new")[1], _tone(30, value=7))
+    store.close()
+
+    # ...and the dropped "cut" line can't come back once the file has grown past its range.
+    store = SegmentStore(str(tmp_path), resume=True)
+    assert sorted(h for h in store.entries if store.get(h) is not None) == ["kept", "new"]
+    np.testing.assert_array_equal(store.get("new")[1], _tone(30, value=7))
+    store.close()
+
+
+def _run(work_dir, output, fake, *extra):
+    argv = [
+        "--csv", os.path.join(work_dir, "deck.csv"),
+        "--en_prompt", os.path.join(work_dir, "en.wav"),
+        "--zh_prompt", os.path.join(work_dir, "zh.wav"),
+        "--model_dir", os.path.join(work_dir, "model"),
+        "--output", output,
+        "--ding", os.path.join(work_dir, "ding.wav"),
+        "--cache_dir", os.path.join(work_dir, "cache"),
+        "--no_cache",
+        "--batch_size", "4",
+    ]
+    csv_batch_tts_v2.main(argv + list(extra), tts_model=fake)
+    with open(output, "rb") as f:
+        return f.read()
+
+
+def test_reexport_row_range_from_full_run(tmp_path, capsys):
+    work_dir = str(tmp_path)
+    os.makedirs(os.path.join(work_dir, "model"))
+    benchmark.make_deck(os.path.join(work_dir, "deck.csv"), 16, repeat_ratio=0.2)
+    benchmark._make_ding(os.path.join(work_dir, "ding.wav"))
+    for name in ("en.wav", "zh.wav"):
+        prompt = benchmark.FakeIndexTTS2()
+        benchmark.write_wav(os.path.join(work_dir, name), prompt.sample_rate, prompt.synthesize(name, "Reference."))
+    temp_dir = os.path.join(work_dir, "temp")
+
+    full = benchmark.FakeIndexTTS2(work_dir)
+    _run(work_dir, os.path.join(work_dir, "full.wav"), full, "--temp_dir", temp_dir, "--keep_temp")
+    assert full.calls
+
+    fresh = _run(
+        work_dir, os.path.join(work_dir, "fresh.wav"), benchmark.FakeIndexTTS2(work_dir),
+        "--temp_dir", os.path.join(work_dir, "temp_fresh"), "--rows", "5:10",
+    )
+    capsys.readouterr()
+
+    for flag in ("--reexport", "--resume"):
+        fake = benchmark.FakeIndexTTS2(work_dir)
+        output = _run(work_dir, os.path.join(work_dir, "range.wav"), fake, "--temp_dir", temp_dir, flag, "--rows", "5:10")
+        assert fake.calls == 0
+        assert "not in the segment store" not in capsys.readouterr().out
+        assert output == fresh
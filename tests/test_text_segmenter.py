@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from text_segmenter import pack_sentences
+
+
+def _sentences(lengths):
+    return ["{}.".format("x" * (n - 1)) for n in lengths]
+
+
+@pytest.mark.parametrize(
+    "lengths,target_len",
+    [
+        ([41] * 10, 50),
+        ([80] * 10, 150),
+        ([30, 45, 12, 60, 8, 33, 47, 21, 55, 19, 40, 9], 100),
+        ([5] * 40, 24),
+    ],
+)
+def test_chunks_stay_within_target_len(lengths, target_len):
+    sentences = _sentences(lengths)
+    chunks = pack_sentences(sentences, target_len)
+
+    assert " ".join(chunks) == " ".join(sentences)
+    assert max(len(chunk) for chunk in chunks) <= target_len
+
+
+def test_only_single_oversized_sentences_exceed_target_len():
+    sentences = _sentences([20, 120, 20, 20, 90, 10])
+    chunks = pack_sentences(sentences, 50)
+
+    assert " ".join(chunks) == " ".join(sentences)
+    for chunk in chunks:
+        assert len(chunk) <= 50 or chunk in sentences
+
+
+def test_chunks_are_balanced_within_the_limit():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        lengths = rng.integers(5, 60, size=int(rng.integers(2, 30))).tolist()
+        chunks = pack_sentences(_sentences(lengths), 100)
+        assert max(len(chunk) for chunk in chunks) <= 100
+    # Greedy packing would give 100 + 100 + 20; balancing evens the chunks out.
+    chunks = pack_sentences(_sentences([20] * 11), 104, joiner="")
+    assert sorted(len(chunk) for chunk in chunks) == [60, 80, 80]
+
+
+def test_chinese_joiner_and_short_input():
+    assert pack_sentences(["你好。", "再见。"], 50, joiner="") == ["你好。再见。"]
+    assert pack_sentences([], 50) == []
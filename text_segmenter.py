@@ -0,0 +1,97 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from length_scheduler import _CJK_RE
+
+
+_LETTER_RE = re.compile(r"[A-Za-z]")
+
+_JOINERS = {"en": " ", "zh": ""}
+
+
+@lru_cache(maxsize=None)
+def get_segmenter(language):
+    # pysbd builds its rule tables per Segmenter; build each language once per process.
+    import pysbd
+
+    return pysbd.Segmenter(language=language, clean=False)
+
+
+def detect_language(text):
+    cjk = len(_CJK_RE.findall(text))
+    latin = len(_LETTER_RE.findall(text))
+    return "zh" if cjk and cjk * 2 >= latin else "en"
+
+
+def split_sentences(text, language=None):
+    language = language or detect_language(text)
+    sentences = (sent.strip() for sent in get_segmenter(language).segment(text))
+    return [sent for sent in sentences if sent]
+
+
+def _greedy_bounds(lengths, target_len, joiner_len):
+    # Fewest chunks within target_len: the original batch_tts packing, as sentence indices.
+    bounds = [0]
+    current = 0
+    for i, length in enumerate(lengths):
+        if current and current + length - joiner_len > target_len:
+            bounds.append(i)
+            current = 0
+        current += length
+    return bounds + [len(lengths)]
+
+
+def pack_sentences(sentences, target_len, joiner=" "):
+    """
+    Join sentences into chunks of near-equal length, none longer than `target_len` unless
+    it is a single sentence that already is.
+
+    Starting from the greedy chunk count, boundaries are the sentence breaks closest to
+    the ideal cut points, picked from the prefix sums in one searchsorted call; the count
+    grows until every chunk fits, with greedy packing as the fallback.
+    """
+    if not sentences:
+        return []
+    target_len = max(1, int(target_len))
+    lengths = np.fromiter((len(s) + len(joiner) for s in sentences), dtype=np.int64, count=len(sentences))
+    prefix = np.concatenate(([0], np.cumsum(lengths)))
+    greedy = _greedy_bounds(lengths.tolist(), target_len, len(joiner))
+    if len(greedy) <= 3:
+        return [joiner.join(sentences[a:b]) for a, b in zip(greedy[:-1], greedy[1:])]
+
+    for count in range(len(greedy) - 1, len(sentences)):
+        ideal = np.arange(1, count) * (prefix[-1] / count)
+        right = np.clip(np.searchsorted(prefix, ideal), 1, len(sentences) - 1)
+        left = np.clip(right - 1, 1, len(sentences) - 1)
+        cuts = np.where(np.abs(prefix[left] - ideal) <= np.abs(prefix[right] - ideal), left, right)
+        bounds = np.array([0] + sorted(set(int(c) for c in cuts)) + [len(sentences)])
+        sizes = prefix[bounds[1:]] - prefix[bounds[:-1]] - len(joiner)
+        if np.all((sizes <= target_len) | (np.diff(bounds) == 1)):
+            break
+    else:
+        bounds = greedy
+    return [joiner.join(sentences[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def split_long_text(text, target_len=50, language=None):
+    text = text.strip()
+    if not text:
+        return []
+    language = language or detect_language(text)
+    if len(text) <= target_len:
+        return [text]
+    return pack_sentences(split_sentences(text, language), target_len, _JOINERS.get(language, " "))
+
+
+def segment_many(texts, target_len=50, language=None):
+    """split_long_text over a whole corpus; returns one chunk list per input text."""
+    done = {}
+    out = []
+    for text in texts:
+        chunks = done.get(text)
+        if chunks is None:
+            chunks = done[text] = split_long_text(text, target_len, language)
+        out.append(list(chunks))
+    return out
@@ -0,0 +1,388 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from simple_tts_v2 import get_model, run_tts_batch, registry
+from inference_profiles import add_profile_argument
+from speaker_cache import SpeakerConditioningCache
+from synthesis_cache import SynthesisCache
+from stream_writers import wav_header
+
+
+MAX_BODY_BYTES = 64 * 1024
+STREAM_CHUNK_BYTES = 64 * 1024
+# Deadline for a client to send its request head, and again for its body.
+READ_TIMEOUT_S = 10.0
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class _Request:
+    __slots__ = ("voice", "prompt_wav", "text", "future")
+
+    def __init__(self, voice, prompt_wav, text, future):
+        self.voice = voice
+        self.prompt_wav = prompt_wav
+        self.text = text
+        self.future = future
+
+
+class SynthesisService:
+    """
+    Asyncio HTTP front end for run_tts_batch.
+
+    Requests are queued (bounded: a full queue answers 503), requests arriving within
+    `batch_window_ms` of each other are coalesced into one micro-batch, and every batch runs
+    on a single dedicated inference thread so the event loop never blocks on the model.
+
+    Voices listed in `voice_models` (name -> model_dir) run on that checkpoint, leased from
+    simple_tts_v2.registry per batch, so models load on first use and idle ones can be
+    evicted under the registry's memory budget; other voices use `tts`.
+    """
+
+    def __init__(
+        self,
+        tts,
+        voices,
+        *,
+        max_queue=64,
+        max_batch=8,
+        batch_window_ms=20,
+        request_timeout_s=60.0,
+        run_kwargs=None,
+        voice_models=None,
+        profile="default",
+        caches=None,
+    ):
+        self.tts = tts
+        self.voices = {name: os.path.abspath(path) for name, path in voices.items()}
+        self.voice_models = {name: os.path.abspath(path) for name, path in (voice_models or {}).items()}
+        self.profile = profile
+        # Synthesis caches per voice model_dir; run_kwargs["cache"] serves `tts`.
+        self.caches = dict(caches or {})
+        self.max_batch = max(1, int(max_batch))
+        self.batch_window_s = max(0.0, batch_window_ms / 1000.0)
+        self.request_timeout_s = float(request_timeout_s)
+        self.run_kwargs = dict(run_kwargs or {})
+        self.queue = asyncio.Queue(maxsize=max(1, int(max_queue)))
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-infer")
+        self.batches = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _synthesize(self, batch):
+        groups = {}
+        for i, req in enumerate(batch):
+            groups.setdefault(self.voice_models.get(req.voice), []).append(i)
+
+        results = [None] * len(batch)
+        for model_dir, indices in groups.items():
+            items = [(batch[i].prompt_wav, batch[i].text, None) for i in indices]
+            if model_dir is None:
+                group_results = run_tts_batch(self.tts, items, batch_size=len(items), **self.run_kwargs)
+            else:
+                run_kwargs = dict(self.run_kwargs, cache=self.caches.get(model_dir))
+                with registry.lease(model_dir, self.profile) as tts:
+                    group_results = run_tts_batch(tts, items, batch_size=len(items), **run_kwargs)
+            for i, result in zip(indices, group_results):
+                results[i] = result
+        return results
+
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Drop requests whose client already timed out or went away.
+            batch = [req for req in batch if not req.future.done()]
+            if not batch:
+                continue
+
+            self.batches += 1
+            try:
+                results = await loop.run_in_executor(self.executor, self._synthesize, batch)
+            except Exception as e:
+                for req in batch:
+                    if not req.future.done():
+                        req.future.set_exception(e)
+                continue
+            for req, result in zip(batch, results):
+                if not req.future.done():
+                    req.future.set_result(result)
+
+    async def submit(self, voice, text):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait(_Request(voice, self.voices[voice], text, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        try:
+            return await asyncio.wait_for(future, self.request_timeout_s)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+
+    async def handle(self, reader, writer):
+        try:
+            status, payload = await self._dispatch(reader)
+            if status == 200 and isinstance(payload, tuple):
+                await self._stream_wav(writer, *payload)
+                self.completed += 1
+            else:
+                await self._send_json(writer, status, payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_head(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return request_line, headers
+
+    async def _dispatch(self, reader):
+        try:
+            request_line, headers = await asyncio.wait_for(self._read_head(reader), READ_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            return 408, {"error": "request head not received in time"}
+        except ValueError:
+            # StreamReader's line limit was exceeded.
+            return 400, {"error": "request line or header too long"}
+        if len(request_line) < 2:
+            return 400, {"error": "malformed request"}
+        method, path = request_line[0], request_line[1].split("?", 1)[0]
+
+        if path == "/health":
+            return 200, {
+                "queue_depth": self.queue.qsize(),
+                "batches": self.batches,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "voices": sorted(self.voices),
+                "models": registry.stats(),
+            }
+        if path != "/synthesize":
+            return 404, {"error": "not found"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            return 400, {"error": "invalid Content-Length"}
+        if length < 0:
+            return 400, {"error": "invalid Content-Length"}
+        if length > MAX_BODY_BYTES:
+            return 413, {"error": "request body too large"}
+        try:
+            data = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            return 408, {"error": "request body not received in time"}
+        try:
+            body = json.loads(data.decode("utf-8"))
+            text = str(body["text"]).strip()
+            voice = body.get("voice") or next(iter(self.voices))
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": "expected JSON body with 'text' and optional 'voice'"}
+        if not text:
+            return 400, {"error": "empty text"}
+        if voice not in self.voices:
+            return 400, {"error": "unknown voice {!r}".format(voice)}
+
+        try:
+            result = await self.submit(voice, text)
+        except asyncio.QueueFull:
+            return 503, {"error": "queue full, retry later"}
+        except asyncio.TimeoutError:
+            return 504, {"error": "synthesis timed out"}
+        except Exception as e:
+            return 500, {"error": str(e)}
+        if result is None:
+            return 500, {"error": "synthesis failed"}
+        return 200, result
+
+    async def _send_json(self, writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = "HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n".format(
+            status, _REASONS.get(status, ""), len(body)
+        )
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write((head + "Connection: close\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _stream_wav(self, writer, sample_rate, samples):
+        samples = np.ascontiguousarray(samples, dtype="<i2")
+        channels = samples.shape[1] if samples.ndim > 1 else 1
+        pcm = memoryview(samples).cast("B")
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: audio/wav\r\n"
+            b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+        )
+        chunks = [wav_header(sample_rate, channels, 2, len(pcm))]
+        chunks.extend(pcm[i:i + STREAM_CHUNK_BYTES] for i in range(0, len(pcm), STREAM_CHUNK_BYTES))
+        for chunk in chunks:
+            writer.write(b"%x\r\n" % len(chunk))
+            writer.write(chunk)
+            writer.write(b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(service, host, port):
+    batcher = asyncio.create_task(service.run_batches())
+    server = await asyncio.start_server(service.handle, host, port)
+    print(">> TTS service listening on http://{}:{} (voices: {})".format(host, port, ", ".join(sorted(service.voices))))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher.cancel()
+        service.executor.shutdown(wait=False)
+
+
+def _parse_voice(value):
+    name, sep, path = value.partition("=")
+    if not sep or not name or not path:
+        raise argparse.ArgumentTypeError("expected NAME=PATH, got {!r}".format(value))
+    return name, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP synthesis service with request queueing and micro-batching")
+    parser.add_argument("--model_dir", type=str, required=True)
+    add_profile_argument(parser)
+    parser.add_argument(
+        "--voice",
+        type=_parse_voice,
+        action="append",
+        required=True,
+        help="NAME=PROMPT_PATH; the first voice is the default",
+    )
+    parser.add_argument(
+        "--voice_model",
+        type=_parse_voice,
+        action="append",
+        default=[],
+        help="NAME=MODEL_DIR; synthesize voice NAME with another checkpoint, loaded on first request",
+    )
+    parser.add_argument(
+        "--model_budget_mb",
+        type=float,
+        default=None,
+        help="Memory budget for loaded models; idle ones are evicted least recently used first (default: TTS_MODEL_BUDGET_MB or unlimited)",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8020)
+    parser.add_argument("--max_queue", type=int, default=64, help="Queued requests before answering 503")
+    parser.add_argument("--max_batch", type=int, default=8, help="Requests coalesced into one micro-batch")
+    parser.add_argument("--batch_window_ms", type=float, default=20, help="How long a batch waits for more requests")
+    parser.add_argument("--request_timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--non_stable", action="store_true", help="Use stochastic decoding")
+    parser.add_argument("--max_retries", type=int, default=2)
+    parser.add_argument(
+        "--retries_per_batch",
+        type=int,
+        default=None,
+        help="Retries shared by one micro-batch, bounding its tail latency (default: unlimited)",
+    )
+    parser.add_argument("--cache_dir", type=str, default=None, help="Optional persistent synthesis cache")
+    parser.add_argument("--cache_max_mb", type=int, default=2048)
+    args = parser.parse_args()
+
+    voices = dict(args.voice)
+    for name, path in voices.items():
+        if not os.path.exists(path):
+            print("CRITICAL: prompt for voice {!r} not found: {}".format(name, path))
+            sys.exit(1)
+    voice_models = dict(args.voice_model)
+    for name, model_dir in voice_models.items():
+        if name not in voices or not os.path.isdir(model_dir):
+            print("CRITICAL: --voice_model {}={} needs a --voice {} and an existing model_dir".format(name, model_dir, name))
+            sys.exit(1)
+    if args.model_budget_mb is not None:
+        registry.budget_bytes = int(args.model_budget_mb * 1024 * 1024)
+
+    print(">> Initializing TTS system...")
+    try:
+        # Only load the shared model up front if some voice uses it.
+        tts_model = None
+        if set(voices) - set(voice_models):
+            tts_model = get_model(args.model_dir, profile=args.profile)
+    except Exception as e:
+        print("CRITICAL: Failed to load model:", e)
+        sys.exit(1)
+
+    run_kwargs = {
+        "stable_mode": not args.non_stable,
+        "max_retries": args.max_retries,
+        "retries_per_batch": args.retries_per_batch,
+        "speaker_cache": SpeakerConditioningCache(max_entries=max(8, len(voices))),
+    }
+    # Evicted models take their speaker conditioning tensors with them.
+    registry.evict_callbacks.append(lambda key, model: run_kwargs["speaker_cache"].forget_model(key[0]))
+    if args.cache_dir:
+        run_kwargs["cache"] = SynthesisCache(
+            args.cache_dir, args.model_dir, max_bytes=args.cache_max_mb * 1024 * 1024, profile=args.profile
+        )
+    caches = {}
+    if args.cache_dir:
+        for model_dir in set(voice_models.values()):
+            caches[os.path.abspath(model_dir)] = SynthesisCache(
+                args.cache_dir, model_dir, max_bytes=args.cache_max_mb * 1024 * 1024, profile=args.profile
+            )
+
+    service = SynthesisService(
+        tts_model,
+        voices,
+        max_queue=args.max_queue,
+        max_batch=args.max_batch,
+        batch_window_ms=args.batch_window_ms,
+        request_timeout_s=args.request_timeout,
+        run_kwargs=run_kwargs,
+        voice_models=voice_models,
+        profile=args.profile,
+        caches=caches,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import wave
+
+import numpy as np
+
+
+def read_wav(path):
+    """(sample_rate, int16 samples shaped (n, channels)) of a 16-bit PCM WAV."""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError("Expected 16-bit PCM: {}".format(path))
+        channels = wf.getnchannels()
+        sample_rate = wf.getframerate()
+        data = wf.readframes(wf.getnframes())
+    return sample_rate, np.frombuffer(data, dtype="<i2").reshape(-1, channels)
+
+
+def write_wav(path, sample_rate, samples):
+    samples = np.asarray(samples)
+    channels = samples.shape[1] if samples.ndim > 1 else 1
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(int(sample_rate))
+        wf.writeframes(np.ascontiguousarray(samples, dtype="<i2"))
@@ -0,0 +1,137 @@
+import os
+import multiprocessing as mp
+
+import length_scheduler
+
+
+_worker = {}
+
+
+class _SharedRetryBudget:
+    """RetryBudget over a shared counter, so all workers draw from one per-batch budget."""
+
+    def __init__(self, counter):
+        self.counter = counter
+
+    def take(self):
+        with self.counter.get_lock():
+            if self.counter.value <= 0:
+                return False
+            self.counter.value -= 1
+            return True
+
+
+def _init_worker(model_dir, threads, profile, run_kwargs, retry_counter, ready):
+    # An initializer that raises makes multiprocessing.Pool respawn the worker forever, so
+    # failures are reported on `ready` and the parent shuts the pool down instead.
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+
+        from simple_tts_v2 import get_model
+
+        _worker["tts"] = get_model(model_dir, use_server=False, profile=profile, threads=threads)
+    except BaseException as e:
+        ready.put("{}: {}".format(type(e).__name__, e))
+        return
+    if run_kwargs.get("cache") is not None:
+        # Key cache entries by the profile this worker actually runs.
+        run_kwargs["cache"].profile = profile
+    _worker["run_kwargs"] = run_kwargs
+    _worker["retry_counter"] = retry_counter
+    ready.put(None)
+
+
+def _cache_counters(cache):
+    if cache is None:
+        return (0, 0, 0)
+    return (cache.hits, cache.misses, cache.evictions)
+
+
+def _run_job(task):
+    from simple_tts_v2 import run_tts_with_model
+
+    index, prompt_wav, text, output_path, max_mel_tokens = task
+    run_kwargs = _worker["run_kwargs"]
+    cache = run_kwargs.get("cache")
+    retry_counter = _worker["retry_counter"]
+    before = _cache_counters(cache)
+    result = run_tts_with_model(
+        _worker["tts"],
+        prompt_wav,
+        text,
+        output_path,
+        max_mel_tokens=max_mel_tokens,
+        retry_budget=_SharedRetryBudget(retry_counter) if retry_counter.value >= 0 else None,
+        **run_kwargs,
+    )
+    after = _cache_counters(cache)
+    return index, result, tuple(a - b for a, b in zip(after, before))
+
+
+class SynthesisWorkerPool:
+    """
+    Process pool where every worker loads the model once (via get_model) with pinned
+    torch thread counts. `run()` has the same contract as simple_tts_v2.run_tts_batch:
+    one result per item, in input order. The constructor waits until every worker has
+    loaded the model and raises RuntimeError if any of them failed to.
+    """
+
+    def __init__(self, model_dir, workers, threads_per_worker=None, profile="default", **run_kwargs):
+        self.workers = max(1, int(workers))
+        if not threads_per_worker:
+            threads_per_worker = max(1, (os.cpu_count() or 1) // self.workers)
+        self.threads_per_worker = int(threads_per_worker)
+        self.cache = run_kwargs.get("cache")
+
+        ctx = mp.get_context("spawn")
+        # Retries left in the current run() call; -1 means no per-batch budget.
+        self._retry_counter = ctx.Value("i", -1)
+        ready = ctx.Queue()
+        self._pool = ctx.Pool(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(
+                os.path.abspath(model_dir), self.threads_per_worker, profile, run_kwargs, self._retry_counter, ready,
+            ),
+        )
+        for _ in range(self.workers):
+            error = ready.get()
+            if error is not None:
+                self.terminate()
+                raise RuntimeError("worker failed to load the model: {}".format(error))
+
+    def run(self, items, length_buckets=False, retries_per_batch=None):
+        items = [(os.path.abspath(item[0]), item[1], item[2]) for item in items]
+        if length_buckets:
+            order, mel_caps = length_scheduler.schedule(items)
+            # Longest first keeps workers evenly loaded at the tail of a batch.
+            order = order[::-1]
+        else:
+            order, mel_caps = list(range(len(items))), [None] * len(items)
+
+        with self._retry_counter.get_lock():
+            self._retry_counter.value = -1 if retries_per_batch is None else max(0, int(retries_per_batch))
+
+        tasks = [(i, items[i][0], items[i][1], items[i][2], mel_caps[i]) for i in order]
+        results = [None] * len(items)
+        for index, result, cache_delta in self._pool.imap_unordered(_run_job, tasks):
+            results[index] = result
+            if self.cache is not None:
+                self.cache.hits += cache_delta[0]
+                self.cache.misses += cache_delta[1]
+                self.cache.evictions += cache_delta[2]
+        return results
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()